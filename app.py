@@ -3,9 +3,12 @@ from datetime import datetime
 import time
 import os
 import sys
+import uuid
+from functools import partial
 
 # Import the copilot classes
 from research_copilot import AdvancedResearchCopilot
+from jobs import JobRunner
 
 st.set_page_config(page_title="AI Research Copilot", layout="wide")
 
@@ -36,24 +39,48 @@ print(f"SERPAPI_KEY loaded: {bool(os.getenv('SERPAPI_KEY'))}", file=sys.stderr)
 print(f"NOTION_TOKEN loaded: {bool(os.getenv('NOTION_TOKEN'))}", file=sys.stderr)
 print(f"NOTION_DATABASE_ID loaded: {bool(os.getenv('NOTION_DATABASE_ID'))}", file=sys.stderr)
 
-# Initialize copilot and store in session state (with timeout protection)
+@st.cache_resource(show_spinner="Initializing AI Research Copilot...")
+def get_shared_copilot() -> AdvancedResearchCopilot:
+    """One copilot per process: Gemini model, HTTP pool, Notion client, caches and workers are shared by all sessions"""
+    return AdvancedResearchCopilot()
+
+def history_owner() -> str:
+    """Stable id for this user's history: the login email, else an id kept in the page URL"""
+    user = getattr(st, "user", None)
+    if user is not None and getattr(user, "is_logged_in", False) and user.get("email"):
+        return user.get("email")
+    if "sid" not in st.query_params:
+        st.query_params["sid"] = uuid.uuid4().hex
+    return st.query_params["sid"]
+
+# Identifies this user's history in the shared store and owns their background jobs
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = history_owner()
+
+# Each session gets a lightweight view of the shared copilot with its own history and settings
 if 'copilot' not in st.session_state:
-    with st.spinner('Initializing AI Research Copilot...'):
-        try:
-            # Check if required API keys exist before initializing
-            gemini_key = os.getenv('GEMINI_API_KEY', '').strip()
-            if not gemini_key:
-                st.session_state.copilot = None
-                st.session_state.init_error = "GEMINI_API_KEY not configured. Please add it to Streamlit Secrets."
-            else:
-                st.session_state.copilot = AdvancedResearchCopilot()
-                st.session_state.init_error = None
-        except Exception as e:
+    try:
+        # Check if required API keys exist before initializing
+        gemini_key = os.getenv('GEMINI_API_KEY', '').strip()
+        if not gemini_key:
             st.session_state.copilot = None
-            st.session_state.init_error = f"Initialization error: {str(e)[:200]}"
+            st.session_state.init_error = "GEMINI_API_KEY not configured. Please add it to Streamlit Secrets."
+        else:
+            st.session_state.copilot = get_shared_copilot().session_view(owner=st.session_state.session_id)
+            st.session_state.init_error = None
+    except Exception as e:
+        st.session_state.copilot = None
+        st.session_state.init_error = f"Initialization error: {str(e)[:200]}"
 
 copilot = st.session_state.copilot
 
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    """Process-wide pool for long tab actions; jobs survive reruns and are looked up by id"""
+    return JobRunner(max_workers=int(os.getenv("APP_JOB_WORKERS", "4")))
+
+jobs = get_job_runner()
+
 # Futuristic CSS
 FUTURISTIC_CSS = """
 <style>
@@ -99,6 +126,106 @@ def neon_header(title: str, subtitle: str = None):
 def render_card(title: str, body: str):
         st.markdown(f"<div class='card'>\n<h4 style='margin:0;color:#e6eef8'>{title}</h4>\n<p style='color:#9aa7b2;margin-top:6px'>{body}</p>\n</div>", unsafe_allow_html=True)
 
+def show_generation_latency():
+        """Caption with the first-token / total latency of the most recent Gemini call"""
+        if copilot and copilot.generation_timings:
+                timing = copilot.generation_timings[-1]
+                source = "cache" if timing['cached'] else "Gemini"
+                st.caption(f"⏱️ First token in {timing['first_token_s']:.2f}s · total {timing['total_s']:.2f}s ({source})")
+
+def research_job(job, copilot, topic, save_to_notion, use_real_time, mode, reuse_similar, deep):
+        job.set_message("Searching, reading sources and summarizing..." if deep else "Searching and summarizing...")
+        result = copilot.research_workflow(topic, save_to_notion=save_to_notion, use_real_time=use_real_time,
+                                           on_summary_chunk=job.emit, mode=mode, reuse_similar=reuse_similar,
+                                           deep=deep)
+        if result.get('notion_future') is not None:
+                job.set_message("Saving to Notion...")
+                result['notion_result'] = result['notion_future'].result()
+                result['notion_future'] = None
+        return result
+
+def streamed_job(job, copilot, make_stream, title, auto_save, history_entry):
+        """Run make_stream() (search + streamed generation), then optionally save to Notion and record history"""
+        job.set_message("Searching and generating...")
+        parts = []
+        for chunk in make_stream():
+                parts.append(chunk)
+                job.emit(chunk)
+        text = "".join(parts)
+        saved_to_notion = False
+        notion_result = None
+        if auto_save and copilot.notion_available:
+                job.set_message("Saving to Notion...")
+                try:
+                        notion_result = copilot.enqueue_notion_page(title, text)
+                        saved_to_notion = True
+                except Exception as e:
+                        notion_result = f"Notion save failed: {e}"
+                        print(f"Notion save failed ({history_entry['type']}): {e}", file=sys.stderr)
+        try:
+                copilot.conversation_history.append(dict(
+                        history_entry,
+                        result=text[:300],
+                        saved_to_notion=saved_to_notion,
+                        notion_result=notion_result,
+                        timestamp=datetime.now().astimezone().isoformat()
+                ))
+        except Exception:
+                pass
+        return {"text": text, "notion_result": notion_result}
+
+def render_job(job):
+        icon = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌", "cancelled": "🚫"}[job.status]
+        with st.container(border=True):
+                st.markdown(f"{icon} **{job.label}** · {job.message} · {job.elapsed:.1f}s")
+                if job.status == "failed":
+                        st.error(job.error)
+                elif job.status == "done" and job.kind == "research":
+                        result = job.result
+                        st.markdown(result['summary'])
+                        if result.get('reused_from'):
+                                reused = result['reused_from']
+                                st.info(f"♻️ Reused research on '{reused['topic']}' from {reused['age_s'] / 60:.0f} min ago "
+                                        f"(similarity {reused['similarity']:.2f}). Untick the reuse option to research it again.")
+                        st.write(result['notion_result'])
+                        st.caption("Stage timings (s): " + ", ".join(f"{name} {seconds:.2f}" for name, seconds in result['timings'].items()))
+                        with st.expander("Search Results (truncated)"):
+                                st.code(result['search_results'])
+                        if result.get('full_text_sources'):
+                                with st.expander(f"Full-text sources ({len(result['full_text_sources'])})"):
+                                        st.markdown("\n".join(f"- {url}" for url in result['full_text_sources']))
+                elif job.status == "done":
+                        st.markdown(job.result['text'])
+                        if job.result['notion_result']:
+                                st.success(job.result['notion_result'])
+                elif job.output:
+                        st.markdown(job.output)
+                if job.done and st.button("Dismiss", key=f"dismiss_{job.id}"):
+                        jobs.discard(job.id)
+                        st.rerun()
+                elif job.status == "queued" and st.button("Cancel", key=f"cancel_{job.id}"):
+                        jobs.cancel(job.id)
+                        st.rerun()
+
+def _render_jobs(kind, polling=False):
+        session_jobs = jobs.jobs(owner=st.session_state.session_id, kind=kind)[:5]
+        for job in session_jobs:
+                render_job(job)
+        if polling and all(job.done for job in session_jobs):
+                # Only from a fragment poll (a full run may still have pending clicks): rerun the page so polling stops
+                st.rerun()
+
+@st.fragment(run_every=float(os.getenv("APP_JOB_POLL_INTERVAL", "1.0")))
+def _poll_jobs(kind):
+        _render_jobs(kind, polling=True)
+
+def show_jobs(kind):
+        """This session's jobs of one kind; polls for progress only while some are unfinished"""
+        if any(not job.done for job in jobs.jobs(owner=st.session_state.session_id, kind=kind)):
+                _poll_jobs(kind)
+        else:
+                _render_jobs(kind)
+
 # Inject CSS
 st.markdown(FUTURISTIC_CSS, unsafe_allow_html=True)
 
@@ -135,6 +262,11 @@ with st.sidebar:
     st.caption("Tips: enter queries and press the action button. Results auto-save to Notion when configured.")
     st.markdown("---")
     if st.button('Reload Copilot'):
+        if copilot:
+            # Revalidate Notion now rather than waiting for the health-check interval
+            copilot.check_notion(force=True)
+        else:
+            st.session_state.pop('copilot', None)
         st.rerun()
 
 # Main layout
@@ -159,6 +291,10 @@ tabs = st.tabs(["Research", "Search", "News", "Summarize", "Compare", "Trends",
 with tabs[0]:
     st.header("End-to-end Research")
     topic = st.text_input("Research topic", value="artificial intelligence")
+    fused_mode = st.checkbox("Single-pass analysis + summary (one Gemini call, fewer tokens)", value=False, key="fused_mode_research")
+    reuse_similar = st.checkbox("Reuse recent research on near-identical topics", value=True, key="reuse_similar_research")
+    deep_research = st.checkbox("Read the full text of the top results (slower, deeper summary)",
+                                value=bool(copilot and copilot.deep_research_enabled), key="deep_research")
     cols = st.columns([1, 1, 1, 1])
     use_real_time = cols[0].checkbox("Use real-time web (SerpAPI)", value=True, key="use_real_time_research")
     auto_save = cols[1].checkbox("Auto-save to Notion (Research)", value=True, key="auto_save_research")
@@ -176,16 +312,11 @@ with tabs[0]:
         elif not topic.strip():
             st.error("Please enter a topic")
         else:
-            with st.spinner('Running research workflow...'):
-                result = copilot.research_workflow(topic, save_to_notion=auto_save, use_real_time=use_real_time)
-            st.success("Research completed")
-            st.subheader("Summary")
-            st.markdown(result['summary'])
-            st.subheader("Notion Result")
-            st.write(result['notion_result'])
-            st.subheader("Search Results (truncated)")
-            st.code(result['search_results'])
-            # record history (research_workflow already appends)
+            jobs.submit("research", f"Research: {topic}", research_job, copilot, topic, auto_save, use_real_time,
+                        "fused" if fused_mode else "standard", reuse_similar, deep_research,
+                        owner=st.session_state.session_id)
+    if copilot:
+        show_jobs("research")
 
 # ------------------ Search Tab ------------------
 with tabs[1]:
@@ -199,10 +330,15 @@ with tabs[1]:
         elif not query.strip():
             st.error("Please enter a search query")
         else:
-            with st.spinner('Searching the web...'):
-                results = copilot.web_search_tool(query, use_serpapi=True)
             st.subheader("Results")
-            st.text_area("Search Output", value=results, height=400)
+            results_placeholder = st.empty()
+            results = ""
+            with st.spinner('Searching the web...'):
+                for chunk in copilot.web_search_tool(query, use_serpapi=True, stream=True):
+                    results += chunk
+                    results_placeholder.code(results, language=None)
+            results_placeholder.text_area("Search Output", value=results, height=400)
+            show_generation_latency()
             # Optionally save to Notion
             saved_to_notion = False
             notion_result = None
@@ -210,7 +346,7 @@ with tabs[1]:
                 try:
                     st.info("Saving search to Notion...")
                     title = f"Search: {query}"
-                    notion_result = copilot.create_notion_page(title, results)
+                    notion_result = copilot.enqueue_notion_page(title, results)
                     st.success(notion_result)
                     saved_to_notion = True
                 except Exception as e:
@@ -243,7 +379,8 @@ with tabs[2]:
             st.error("Please enter a news query")
         else:
             with st.spinner('Fetching news...'):
-                news_results = copilot.search_news_only(news_q)
+                news_response = copilot.search_news(news_q)
+                news_results = news_response.error or news_response.text()
             st.text_area("News Output", value=news_results, height=400)
             # Optionally save to Notion
             saved_to_notion = False
@@ -252,7 +389,8 @@ with tabs[2]:
                 try:
                     st.info("Saving news to Notion...")
                     title = f"News: {news_q}"
-                    notion_result = copilot.create_notion_page(title, news_results)
+                    # Markdown keeps headings and linked titles on the Notion page
+                    notion_result = copilot.enqueue_notion_page(title, news_response.error or news_response.markdown())
                     st.success(notion_result)
                     saved_to_notion = True
                 except Exception as e:
@@ -277,6 +415,8 @@ with tabs[3]:
     st.header("Summarize Text")
     content = st.text_area("Paste text to summarize", height=250)
     topic_for_summary = st.text_input("Topic (optional)")
+    long_document_mode = st.radio("Long documents", ["Auto", "Map-reduce", "Single pass"], horizontal=True,
+                                  help="Map-reduce summarizes sections in parallel and reuses unchanged sections from cache")
     summarize_cols = st.columns([3, 1])
     summarize_auto_save = summarize_cols[1].checkbox("Auto-save to Notion (Summarize)", value=True, key="auto_save_summarize")
     if summarize_cols[0].button('Summarize'):
@@ -285,10 +425,16 @@ with tabs[3]:
         elif not content.strip():
             st.error("Please enter text to summarize")
         else:
-            with st.spinner('Generating summary...'):
-                summary = copilot.summarize_research(content, topic_for_summary or "General")
             st.subheader("Summary")
-            st.markdown(summary)
+            map_reduce = {"Auto": None, "Map-reduce": True, "Single pass": False}[long_document_mode]
+            copilot.last_map_reduce = None
+            summary = st.write_stream(copilot.summarize_research(content, topic_for_summary or "General", stream=True,
+                                                                 map_reduce=map_reduce))
+            show_generation_latency()
+            if copilot.last_map_reduce:
+                run = copilot.last_map_reduce
+                st.caption(f"🧩 {run['sections']} sections ({run['cached_sections']} unchanged, from cache) "
+                           f"summarized in {run['map_s']:.1f}s before the final summary")
             # Optionally save summary to Notion
             saved_to_notion = False
             notion_result = None
@@ -296,7 +442,7 @@ with tabs[3]:
                 try:
                     st.info("Saving summary to Notion...")
                     title = f"Summary: { (topic_for_summary or 'General') }"
-                    notion_result = copilot.create_notion_page(title, summary)
+                    notion_result = copilot.enqueue_notion_page(title, summary)
                     st.success(notion_result)
                     saved_to_notion = True
                 except Exception as e:
@@ -329,35 +475,11 @@ with tabs[4]:
         elif not c1.strip() or not c2.strip():
             st.error("Please enter both concepts")
         else:
-            with st.spinner('Comparing...'):
-                cmp = copilot.compare_concepts(c1, c2)
-            st.markdown(cmp)
-            # Optionally save compare result to Notion
-            saved_to_notion = False
-            notion_result = None
-            if compare_auto_save and copilot.notion_available:
-                try:
-                    title = f"Compare: {c1} vs {c2}"
-                    notion_result = copilot.create_notion_page(title, cmp)
-                    st.success(notion_result)
-                    saved_to_notion = True
-                except Exception as e:
-                    st.error(f"Notion save failed: {e}")
-                    print(f"Notion save failed (Compare): {e}", file=sys.stderr)
-
-            # Record history for comparisons
-            try:
-                copilot.conversation_history.append({
-                    "type": "compare",
-                    "concept_a": c1,
-                    "concept_b": c2,
-                    "result": cmp[:300] if isinstance(cmp, str) else str(cmp)[:300],
-                    "saved_to_notion": saved_to_notion,
-                    "notion_result": notion_result,
-                    "timestamp": datetime.now().astimezone().isoformat()
-                })
-            except Exception:
-                pass
+            jobs.submit("compare", f"Compare: {c1} vs {c2}", streamed_job, copilot,
+                        partial(copilot.compare_concepts, c1, c2, stream=True), f"Compare: {c1} vs {c2}", compare_auto_save,
+                        {"type": "compare", "concept_a": c1, "concept_b": c2}, owner=st.session_state.session_id)
+    if copilot:
+        show_jobs("compare")
 
 # ------------------ Trends Tab ------------------
 with tabs[5]:
@@ -371,40 +493,45 @@ with tabs[5]:
         elif not trend_topic.strip():
             st.error("Please enter a topic")
         else:
-            with st.spinner('Analyzing trends...'):
-                trends = copilot.analyze_research_trends(trend_topic)
-            st.markdown(trends)
-            # Optionally save trends to Notion
-            saved_to_notion = False
-            notion_result = None
-            if trends_auto_save and copilot.notion_available:
-                try:
-                    title = f"Trends: {trend_topic}"
-                    notion_result = copilot.create_notion_page(title, trends)
-                    st.success(notion_result)
-                    saved_to_notion = True
-                except Exception as e:
-                    st.error(f"Notion save failed: {e}")
-                    print(f"Notion save failed (Trends): {e}", file=sys.stderr)
-
-            # Record history for trend analysis
-            try:
-                copilot.conversation_history.append({
-                    "type": "trends",
-                    "topic": trend_topic,
-                    "result": trends[:300] if isinstance(trends, str) else str(trends)[:300],
-                    "saved_to_notion": saved_to_notion,
-                    "notion_result": notion_result,
-                    "timestamp": datetime.now().astimezone().isoformat()
-                })
-            except Exception:
-                pass
+            jobs.submit("trends", f"Trends: {trend_topic}", streamed_job, copilot,
+                        partial(copilot.analyze_research_trends, trend_topic, stream=True), f"Trends: {trend_topic}",
+                        trends_auto_save, {"type": "trends", "topic": trend_topic}, owner=st.session_state.session_id)
+    if copilot:
+        show_jobs("trends")
 
 # ------------------ Notion Tab ------------------
 with tabs[6]:
     st.header("Notion Tools")
     st.markdown("**Notion Diagnostics**")
     st.write(f"- Notion integration available: {'✅' if copilot and copilot.notion_available else '❌'}")
+    if copilot and copilot.notion_configured and not copilot.notion_available:
+        st.caption(f"Last health check error: {copilot.check_notion()['error']}")
+    if copilot and copilot.notion_queue is not None:
+        st.markdown("**Write-behind Queue**")
+        queue_stats = copilot.notion_queue.stats()
+        queue_cols = st.columns(4)
+        queue_cols[0].metric("Queue depth", queue_stats['depth'])
+        queue_cols[1].metric("Lag", f"{queue_stats['lag_s']:.0f}s")
+        queue_cols[2].metric("Saved", queue_stats['done'])
+        queue_cols[3].metric("Failed", queue_stats['failed'], delta=f"{queue_stats['retries']} retries", delta_color="off")
+        if not queue_stats['worker_alive']:
+            st.warning("Notion writer is not running")
+        if queue_stats['last_error']:
+            st.caption(f"Last error: {queue_stats['last_error'][:200]}")
+        if queue_stats['failed'] and st.button('Retry failed saves'):
+            st.success(f"Requeued {copilot.notion_queue.retry_failed()} page(s)")
+    if copilot and copilot.notion_index is not None:
+        st.markdown("**Local Notion Index**")
+        index_stats = copilot.notion_index.stats()
+        index_cols = st.columns(2)
+        index_cols[0].metric("Indexed pages", index_stats['pages'])
+        sync_age = index_stats['last_sync_age_s']
+        index_cols[1].metric("Last sync", f"{sync_age:.0f}s ago" if sync_age is not None else "never")
+        if st.button('Sync Notion index'):
+            with st.spinner('Syncing Notion index...'):
+                # Full, so pages deleted in Notion are pruned too
+                sync_result = copilot.sync_notion_index(full=True)
+            st.success(f"Synced {sync_result['updated']} page(s), removed {sync_result['removed']} in {sync_result['elapsed_s']:.1f}s")
     if st.button('Run Notion Test'):
         if not copilot:
             st.error("Copilot not initialized")
@@ -463,7 +590,18 @@ with tabs[6]:
 with tabs[7]:
     st.header("Session History")
     if copilot and copilot.conversation_history:
-        for i, item in enumerate(reversed(copilot.conversation_history[-20:]), 1):
+        history_cols = st.columns([1, 2, 1])
+        history_type = history_cols[0].selectbox("Type", ["all", "research", "search", "news", "summarize", "compare", "trends", "notion_create"], key="history_type")
+        history_topic = history_cols[1].text_input("Topic contains", key="history_topic")
+        history_page_number = history_cols[2].number_input("Page", min_value=1, value=1, step=1, key="history_page")
+        history_page = copilot.conversation_history.page(
+            page=int(history_page_number), page_size=20,
+            type=None if history_type == "all" else history_type,
+            topic=history_topic.strip() or None
+        )
+        st.caption(f"{history_page['total']} entries · page {history_page['page']} of {history_page['pages']}")
+        offset = (history_page['page'] - 1) * 20
+        for i, item in enumerate(history_page['entries'], offset + 1):
             st.markdown(f"**{i}.** {item.get('topic', item.get('query', item.get('type', 'Unknown')))}")
             st.write(item)
             st.markdown("---")
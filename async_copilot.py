@@ -0,0 +1,433 @@
+"""Asyncio-native research copilot for driving many research tasks from one process"""
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import httpx
+from notion_client import AsyncClient
+
+from cache import make_cache_key
+from notion_blocks import chunk_blocks, plain_text_blocks
+from notion_queue import NotionPartialWrite
+from prompt_budget import compact_text, count_tokens
+from research_copilot import AdvancedResearchCopilot, ResearchCopilot, WORKFLOW_MODES
+from search_models import SearchResponse
+
+
+class AsyncResearchCopilot:
+    """Async counterparts of the copilot's I/O paths (SerpAPI, Gemini, Notion).
+
+    Prompts, parsing, formatting, caches, history, the search router and the research
+    index are shared with a regular ResearchCopilot. Every upstream gets its own semaphore
+    so one event loop can run dozens of research tasks, and calls also pass through the
+    copilot's service_limits, so its concurrency caps and rates (e.g. NOTION_RATE) hold
+    across the sync and async paths together.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, copilot: ResearchCopilot = None, serpapi_concurrency: int = None,
+                 gemini_concurrency: int = None, notion_concurrency: int = None):
+        self.copilot = copilot or AdvancedResearchCopilot()
+        self.limits = {
+            "serpapi": asyncio.Semaphore(serpapi_concurrency or int(os.getenv("ASYNC_SERPAPI_CONCURRENCY", "10"))),
+            "gemini": asyncio.Semaphore(gemini_concurrency or int(os.getenv("ASYNC_GEMINI_CONCURRENCY", "8"))),
+            "notion": asyncio.Semaphore(notion_concurrency or int(os.getenv("ASYNC_NOTION_CONCURRENCY", "3"))),
+        }
+        self.max_retries = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+        self._http = None
+        self._notion = None
+        self._inflight_generations: Dict[str, asyncio.Future] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running event loop
+        if self._http is None:
+            pool_size = int(os.getenv("HTTP_POOL_SIZE", "20"))
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+                                      connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")))
+            )
+        return self._http
+
+    @property
+    def notion(self) -> AsyncClient:
+        if self._notion is None and self.copilot.notion_available:
+            self._notion = AsyncClient(auth=self.copilot.notion_token)
+        return self._notion
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._notion is not None:
+            await self._notion.aclose()
+            self._notion = None
+
+    @contextlib.asynccontextmanager
+    async def _limited(self, service: str):
+        """This loop's semaphore for service, then the copilot's shared limiter (concurrency caps and pacing)"""
+        async with self.limits[service], self.copilot.service_limits[service]:
+            yield
+
+    async def _get_json(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET with exponential backoff and jitter on connection errors, 429 and 5xx"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.http.get(url, params=params)
+            except (httpx.ConnectError, httpx.TimeoutException):
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, min(8.0, 0.5 * (2 ** attempt))))
+                continue
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else random.uniform(0, min(8.0, 0.5 * (2 ** attempt)))
+                await asyncio.sleep(min(delay, 8.0))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    async def serpapi_search(self, query: str, num_results: int = 10) -> SearchResponse:
+        """Perform real-time web search using SerpAPI"""
+        copilot = self.copilot
+        if not copilot.serpapi_available:
+            return SearchResponse.failed("SerpAPI not configured")
+
+        params = {
+            'q': query,
+            'api_key': copilot.serpapi_key,
+            'engine': 'google',
+            'num': num_results,
+            'hl': 'en',
+            'gl': 'us'
+        }
+        try:
+            key = copilot._search_cache_key(params)
+            start = time.perf_counter()
+            # The cache's disk tier is SQLite; keep its reads and commits off the event loop
+            cached = await asyncio.to_thread(copilot.search_cache.get, key)
+            if cached is not None:
+                copilot._record_search_latency("cached", time.perf_counter() - start)
+                return cached
+
+            async with self._limited("serpapi"):
+                data = await self._get_json('https://serpapi.com/search', params)
+            results = copilot._parse_serpapi_results(data)
+            copilot._record_search_latency("upstream", time.perf_counter() - start)
+            if not data.get("error"):
+                await asyncio.to_thread(copilot.search_cache.set, key, results, copilot._search_cache_ttl(params))
+            return results
+        except Exception as e:
+            return SearchResponse.failed(f"SerpAPI search error: {str(e)}")
+
+    async def gemini_generate(self, prompt: str, context: str = "") -> str:
+        """Generate response using Gemini API with context"""
+        copilot = self.copilot
+        try:
+            start = time.perf_counter()
+            full_prompt = copilot._build_prompt(prompt, context)
+            key = make_cache_key(copilot.model_name, full_prompt)
+            cached = await asyncio.to_thread(copilot.generation_cache.get, key)
+            if cached is not None:
+                copilot._record_generation_timing(start, start, cached=True)
+                return cached
+
+            # Coalesce identical in-flight prompts onto one upstream call
+            pending = self._inflight_generations.get(key)
+            if pending is not None:
+                return await asyncio.shield(pending)
+
+            future = asyncio.get_running_loop().create_future()
+            self._inflight_generations[key] = future
+            try:
+                async with self._limited("gemini"):
+                    response = await copilot.model.generate_content_async(full_prompt)
+                text = response.text
+                future.set_result(text)
+            except Exception as e:
+                future.set_exception(e)
+                # Mark retrieved so an unawaited failure doesn't log "exception never retrieved"
+                future.exception()
+                raise
+            finally:
+                self._inflight_generations.pop(key, None)
+
+            copilot._record_usage(response)
+            copilot._record_generation_timing(start, time.perf_counter())
+            await asyncio.to_thread(copilot.generation_cache.set, key, text, copilot.generation_cache_ttl)
+            return text
+        except Exception as e:
+            return f"Error generating response: {str(e)}"
+
+    async def _search_backend(self, backend, query: str, num_results: int) -> SearchResponse:
+        if backend.name != "serpapi":
+            # Local indexes (Notion mirror, corpus): SQLite and file reads, so off the loop
+            return await asyncio.to_thread(self.copilot.search_router._timed, backend, query, num_results)
+        start = time.perf_counter()
+        response = await self.serpapi_search(query, num_results)
+        self.copilot.search_router._record(backend.name, "errors" if response.error else None,
+                                           time.perf_counter() - start)
+        return response
+
+    async def search(self, query: str, num_results: int = 10) -> SearchResponse:
+        """Search every available backend concurrently; results merged, deduplicated and ranked (see SearchRouter)"""
+        router = self.copilot.search_router
+        backends = await asyncio.to_thread(router.available)
+        if not backends:
+            return SearchResponse.failed("No search backend configured")
+        if len(backends) == 1:
+            return await self._search_backend(backends[0], query, num_results)
+        tasks = {asyncio.ensure_future(self._search_backend(backend, query, num_results)): backend
+                 for backend in backends}
+        # Late backends keep running (a late SerpAPI answer still lands in the search cache)
+        done, late = await asyncio.wait(tasks, timeout=router.deadline)
+        responses = [(backend.name, task.result()) for task, backend in tasks.items() if task in done]
+        return router.merge(responses, [tasks[task].name for task in late], num_results)
+
+    async def web_search_tool(self, query: str, use_serpapi: bool = True, search_data: SearchResponse = None) -> str:
+        """Perform web search across the search backends or fallback to Gemini
+
+        Pass search_data to analyze results that were already fetched instead of searching again.
+        """
+        copilot = self.copilot
+        try:
+            if search_data is None and use_serpapi and await asyncio.to_thread(lambda: copilot.search_available):
+                search_data = await self.search(query)
+            if search_data is not None:
+                formatted_results = copilot.format_search_results(search_data)
+                if search_data.get("organic_results") or search_data.get("news_results"):
+                    analysis = await self.gemini_generate(copilot._analysis_prompt(query, search_data))
+                    return f"REAL-TIME SEARCH RESULTS:\n{formatted_results}\n\nAI ANALYSIS:\n{analysis}"
+                return formatted_results
+            return await self.gemini_generate(copilot._simulated_search_prompt(query))
+        except Exception as e:
+            return f"Search error: {str(e)}"
+
+    async def summarize_research(self, content: str, topic: str, prior: str = None, from_search: bool = False) -> str:
+        """Summarize research findings using Gemini; long content takes the copilot's map-reduce path
+
+        As in ResearchCopilot.summarize_research, only from_search content is compacted.
+        """
+        copilot = self.copilot
+        source = compact_text(content) if from_search else content
+        if 0 < copilot.summary_map_reduce_tokens < count_tokens(source):
+            return await asyncio.to_thread(copilot.summarize_long, content, topic, False, prior, from_search)
+        return await self.gemini_generate(copilot._summarize_prompt(content, topic, prior, from_search))
+
+    async def create_notion_page(self, title: str, content: str, tags: List[str] = None) -> str:
+        """Create a new research page in Notion"""
+        copilot = self.copilot
+        if not self.notion:
+            return "⚠️  Notion integration not configured"
+
+        if not copilot.notion_database_id:
+            return "⚠️  Notion database ID not configured"
+
+        try:
+            batches = chunk_blocks(copilot._notion_content_blocks(content)) if content else []
+            properties = copilot._notion_page_properties(title, tags)
+            parent = {"database_id": copilot.notion_database_id}
+            try:
+                async with self._limited("notion"):
+                    response = await self.notion.pages.create(parent=parent, properties=properties,
+                                                              children=batches[0] if batches else [])
+            except Exception as e:
+                if not batches or not copilot._is_validation_error(e):
+                    raise
+                # Notion rejected the parsed markdown; retry with plain paragraphs
+                batches = chunk_blocks(plain_text_blocks(content))
+                async with self._limited("notion"):
+                    response = await self.notion.pages.create(parent=parent, properties=properties,
+                                                              children=batches[0])
+            for index in range(1, len(batches)):
+                try:
+                    await self._append_notion_blocks(response['id'], batches[index])
+                except Exception as e:
+                    print(f"Notion append failed for '{title}': {str(e)[:120]}", file=sys.stderr)
+                    progress = {"page_id": response['id'], "batches_written": index}
+                    return copilot._format_partial_write(title, NotionPartialWrite(progress, e))
+            await asyncio.to_thread(copilot._index_notion_page, title, response, content)
+            return f"✅ Successfully created Notion page: '{title}'"
+        except Exception as e:
+            return copilot._format_notion_error(e)
+
+    async def _append_notion_blocks(self, page_id: str, blocks: List[Dict[str, Any]]):
+        """Append one batch of blocks, retrying 429s, 5xx and timeouts with backoff"""
+        copilot = self.copilot
+        for attempt in range(copilot.notion_append_retries + 1):
+            try:
+                async with self._limited("notion"):
+                    return await self.notion.blocks.children.append(block_id=page_id, children=blocks)
+            except Exception as e:
+                if attempt >= copilot.notion_append_retries or not copilot._is_retryable_notion_error(e):
+                    raise
+                await asyncio.sleep(copilot._notion_retry_delay(e, attempt))
+
+    async def search_notion(self, query: str) -> str:
+        """Search existing research in Notion"""
+        if not self.notion:
+            return "Notion integration not configured"
+
+        if self.copilot.notion_index is not None:
+            # Local SQLite query; off the loop since the first call may run the initial sync
+            indexed = await asyncio.to_thread(self.copilot._search_notion_index, query)
+            if indexed is not None:
+                return indexed
+
+        try:
+            async with self._limited("notion"):
+                response = await self.notion.search(query=query)
+            return self.copilot._format_notion_search(response.get("results", []))
+        except Exception as e:
+            return f"Search error: {str(e)}"
+
+    async def research_workflow(self, topic: str, save_to_notion: bool = True, use_real_time: bool = True,
+                                wait_for_save: bool = True, mode: str = None, reuse_similar: bool = True,
+                                deep: bool = None) -> Dict[str, Any]:
+        """Async research workflow: (Notion lookup ∥ prior findings ∥ search) → summarize → save
+
+        Same steps and result as ResearchCopilot.research_workflow, including deep research
+        and indexing the new summary. With wait_for_save=False the save runs as a task
+        returned under "notion_future".
+        """
+        copilot = self.copilot
+        mode = mode or copilot.workflow_mode
+        deep = (copilot.deep_research_enabled if deep is None else deep) and use_real_time
+        if mode not in WORKFLOW_MODES:
+            raise ValueError(f"Unknown workflow mode '{mode}', expected one of {WORKFLOW_MODES}")
+        workflow_start = time.perf_counter()
+        if reuse_similar:
+            prior = await asyncio.to_thread(copilot._find_prior_research, topic, use_real_time)
+            if prior is not None:
+                return await asyncio.to_thread(copilot._reuse_prior_research, topic, prior, use_real_time, None,
+                                               workflow_start)
+        timings: Dict[str, float] = {}
+
+        async def timed(name: str, coro):
+            start = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                timings[name] = round(time.perf_counter() - start, 3)
+
+        async def check_existing() -> str:
+            if copilot.notion_available:
+                return await self.search_notion(topic)
+            return "Notion not available"
+
+        async def recall() -> str:
+            try:
+                return await asyncio.to_thread(copilot.prior_findings, topic)
+            except Exception as e:
+                print(f"vector-index: retrieval failed: {e}", file=sys.stderr)
+                return ""
+
+        async def search_only():
+            if use_real_time and await asyncio.to_thread(lambda: copilot.search_available):
+                return await self.search(topic)
+            return None
+
+        async def full_text(hits) -> List[Dict[str, Any]]:
+            if hits is None or not hits.has_results:
+                return []
+            return await timed("full_text", asyncio.to_thread(copilot.fetch_full_text, hits))
+
+        fused = mode == "fused"
+
+        async def search():
+            """(search output, full-text pages); deep research fetches pages while the hits are analyzed"""
+            if fused:
+                hits = await search_only()
+                return hits, await full_text(hits) if deep else []
+            if deep:
+                hits = await search_only()
+                return await asyncio.gather(self.web_search_tool(topic, use_serpapi=use_real_time, search_data=hits),
+                                            full_text(hits))
+            return await self.web_search_tool(topic, use_serpapi=use_real_time), []
+
+        recalled = timed("prior_findings", recall()) if copilot.rag_enabled else asyncio.sleep(0, "")
+        existing_research, prior, (search_output, pages) = await asyncio.gather(
+            timed("existing_research", check_existing()),
+            recalled,
+            timed("web_search", search())
+        )
+
+        if fused:
+            prompt = copilot._fused_prompt(topic, search_output, pages, prior)
+            text = await timed("summarize", self.gemini_generate(prompt))
+            analysis, summary = copilot._split_fused_response(text)
+            if search_output is not None and search_output.has_results:
+                search_results = f"REAL-TIME SEARCH RESULTS:\n{copilot.format_search_results(search_output)}\n\nAI ANALYSIS:\n{analysis}"
+            else:
+                search_results = analysis
+        else:
+            search_results = search_output
+            content = search_results
+            if pages:
+                # Long enough to take the map-reduce path of summarize_research
+                content += "\n\n" + copilot._full_text_content(pages)
+            summary = await timed("summarize", self.summarize_research(content, topic, prior, from_search=True))
+
+        notion_result = ""
+        notion_future = None
+        saving = save_to_notion and copilot.notion_available
+        if saving:
+            save = timed("notion_save", self.create_notion_page(f"Research: {topic}", summary, tags=[topic, "research"]))
+            if wait_for_save:
+                notion_result = await save
+                print(f"research_workflow: create_notion_page result: {notion_result}", file=sys.stderr)
+            else:
+                notion_future = asyncio.ensure_future(save)
+                notion_result = "⏳ Saving to Notion in the background..."
+        elif save_to_notion:
+            notion_result = "⚠️  Notion not available for saving"
+        timings["total"] = round(time.perf_counter() - workflow_start, 3)
+
+        await asyncio.to_thread(copilot.conversation_history.append, {
+            "topic": topic,
+            "summary": summary,
+            "saved_to_notion": saving,
+            "used_real_time": use_real_time,
+            "timestamp": datetime.now().isoformat()
+        })
+
+        succeeded = bool(summary) and not summary.startswith("Error generating response")
+        result = {
+            "topic": topic,
+            "existing_research": existing_research,
+            "search_results": search_results[:500] + "..." if isinstance(search_results, str) and len(search_results) > 500 else search_results,
+            "summary": summary,
+            "notion_result": notion_result,
+            "notion_future": notion_future,
+            "timings": timings,
+            "mode": mode,
+            "conversation_history": len(copilot.conversation_history),
+            "used_real_time_search": use_real_time,
+            "full_text_sources": [page["url"] for page in pages or []],
+            "used_prior_research": bool(prior),
+            "succeeded": succeeded
+        }
+        if succeeded:
+            await asyncio.to_thread(copilot.index_research, [copilot._summary_document(topic, summary)])
+        if copilot.semantic_cache is not None and succeeded:
+            await asyncio.to_thread(copilot.semantic_cache.add, topic, summary, {
+                key: result[key] for key in ("existing_research", "search_results", "mode", "used_real_time_search")
+            })
+        return result
+
+    async def research_many(self, topics: List[str], **kwargs) -> List[Dict[str, Any]]:
+        """Run research_workflow for every topic concurrently (bounded by the per-upstream semaphores)"""
+        return await asyncio.gather(*(self.research_workflow(topic, **kwargs) for topic in topics))
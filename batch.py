@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Batch research: run research_workflow over many topics with bounded concurrency.
+
+Usage:
+    python batch.py topics.txt -o results.jsonl [--max-concurrency 8]
+                    [--rate serpapi=5 --rate gemini=2 --rate notion=3]
+                    [--limit gemini=4] [--mode fused] [--no-notion]
+
+topics.txt holds one topic per line (blank lines and lines starting with '#' are ignored).
+Results are appended to the JSONL output as each topic finishes; re-running with the same
+output file resumes, skipping topics that already completed successfully.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+def load_topics(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def completed_topics(output_path: str) -> set:
+    """Topics already researched successfully according to an existing JSONL output"""
+    done = set()
+    if not output_path or not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "ok":
+                done.add(record.get("topic"))
+    return done
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_batch(copilot, topics: List[str], max_concurrency: int = 4, rate_limits: Dict[str, float] = None,
+              service_concurrency: Dict[str, int] = None, output_path: str = None, save_to_notion: bool = True,
+              **workflow_kwargs) -> Dict[str, Any]:
+    """Research every topic, pipelining search, generation and Notion saves across topics.
+
+    Up to max_concurrency topics are in flight; each topic's Notion save runs in the
+    background so its worker can move on. rate_limits / service_concurrency cap the
+    serpapi, gemini and notion services while the batch runs. Returns a throughput
+    summary (topics/min and p50/p95 per stage).
+    """
+    seen = set()
+    topics = [t for t in topics if not (t in seen or seen.add(t))]
+    already_done = completed_topics(output_path)
+    pending = [t for t in topics if t not in already_done]
+
+    previous_limits = dict(copilot.service_limits)
+    if rate_limits or service_concurrency:
+        copilot.configure_service_limits(service_concurrency, rate_limits)
+
+    write_lock = threading.Lock()
+    stage_times: Dict[str, List[float]] = {}
+    counts = {"ok": 0, "error": 0}
+    output = open(output_path, "a", encoding="utf-8") if output_path else None
+    started = time.perf_counter()
+
+    def finish(topic: str, record: Dict[str, Any], completion: Future):
+        record["completed_at"] = datetime.now().isoformat()
+        try:
+            with write_lock:
+                if output:
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output.flush()
+                counts[record["status"]] += 1
+                for stage, seconds in record.get("timings", {}).items():
+                    stage_times.setdefault(stage, []).append(seconds)
+                done = counts["ok"] + counts["error"]
+                icon = "✅" if record["status"] == "ok" else "❌"
+                print(f"[{done}/{len(pending)}] {icon} {topic}", file=sys.stderr)
+        except Exception as e:
+            # Always complete the future, or the batch would wait on it forever
+            print(f"batch: could not record '{topic}': {e}", file=sys.stderr)
+            with write_lock:
+                counts["error"] += 1
+            completion.set_exception(e)
+            return
+        completion.set_result(record)
+
+    def process(topic: str, completion: Future):
+        try:
+            result = copilot.research_workflow(topic, save_to_notion=save_to_notion, wait_for_save=False,
+                                               **workflow_kwargs)
+            record = {
+                "topic": topic,
+                # research_workflow reports a failed generation in the summary instead of raising;
+                # an error record keeps the topic out of completed_topics so a resumed run retries it
+                "status": "ok" if result.get("succeeded", True) else "error",
+                "summary": result["summary"],
+                "existing_research": result["existing_research"],
+                "notion_result": result["notion_result"],
+                "mode": result.get("mode"),
+                "timings": result["timings"],
+            }
+            if record["status"] == "error":
+                record["error"] = result["summary"]
+        except Exception as e:
+            finish(topic, {"topic": topic, "status": "error", "error": str(e)}, completion)
+            return
+
+        notion_future = result.get("notion_future")
+        if notion_future is None:
+            finish(topic, record, completion)
+            return
+
+        # Free this worker for the next topic; the record is written once the save lands
+        def saved(future: Future):
+            try:
+                record["notion_result"] = future.result()
+            except Exception as e:
+                record["notion_result"] = f"❌ Notion save exception: {e}"
+            record["timings"] = dict(result["timings"])
+            finish(topic, record, completion)
+        notion_future.add_done_callback(saved)
+
+    try:
+        completions = []
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="batch") as pool:
+            for topic in pending:
+                completion = Future()
+                completions.append(completion)
+                pool.submit(process, topic, completion)
+            wait(completions)
+    finally:
+        copilot.service_limits.update(previous_limits)
+        if output:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "topics": len(topics),
+        "skipped": len(topics) - len(pending),
+        "completed": counts["ok"],
+        "failed": counts["error"],
+        "elapsed_s": round(elapsed, 2),
+        "topics_per_min": round(counts["ok"] / elapsed * 60, 2) if elapsed > 0 and counts["ok"] else 0.0,
+        "stages": {
+            stage: {"p50": round(percentile(times, 50), 3), "p95": round(percentile(times, 95), 3)}
+            for stage, times in stage_times.items()
+        },
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    print("\n📈 BATCH SUMMARY")
+    print("=" * 50)
+    print(f"Topics: {summary['topics']} ({summary['skipped']} already done, "
+          f"{summary['completed']} completed, {summary['failed']} failed)")
+    print(f"Elapsed: {summary['elapsed_s']:.1f}s — {summary['topics_per_min']:.2f} topics/min")
+    if summary["stages"]:
+        print(f"\n{'stage':<20}{'p50 s':>10}{'p95 s':>10}")
+        for stage, stats in summary["stages"].items():
+            print(f"{stage:<20}{stats['p50']:>10.2f}{stats['p95']:>10.2f}")
+    print("=" * 50)
+
+
+def _parse_pairs(pairs: List[str], cast) -> Dict[str, Any]:
+    parsed = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        if not value:
+            raise argparse.ArgumentTypeError(f"Expected service=value, got '{pair}'")
+        parsed[name.strip()] = cast(value)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the research workflow over many topics")
+    parser.add_argument("topics_file", help="text file with one topic per line")
+    parser.add_argument("-o", "--output", default="research_results.jsonl", help="JSONL results file (also the resume checkpoint)")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="topics in flight at once")
+    parser.add_argument("--rate", action="append", metavar="SERVICE=RPS", help="requests/second cap, e.g. gemini=2")
+    parser.add_argument("--limit", action="append", metavar="SERVICE=N", help="concurrent call cap, e.g. notion=3")
+    parser.add_argument("--mode", choices=["standard", "fused"], default=None, help="research_workflow mode")
+    parser.add_argument("--no-notion", action="store_true", help="don't save results to Notion")
+    parser.add_argument("--no-real-time", action="store_true", help="skip SerpAPI and use Gemini knowledge only")
+    args = parser.parse_args()
+
+    from research_copilot import AdvancedResearchCopilot
+
+    copilot = AdvancedResearchCopilot()
+    summary = copilot.research_batch(
+        load_topics(args.topics_file),
+        max_concurrency=args.max_concurrency,
+        rate_limits=_parse_pairs(args.rate, float),
+        service_concurrency=_parse_pairs(args.limit, int),
+        output_path=args.output,
+        save_to_notion=not args.no_notion,
+        use_real_time=not args.no_real_time,
+        mode=args.mode,
+    )
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the AI Research Copilot.
+
+Usage:
+    python benchmark.py workflow-modes --topics "llm agents" "vector databases" [--offline]
+    python benchmark.py notion-bulk [--pages 60] [--concurrency 4] [--rate 10]
+    python benchmark.py startup [--repeat 5] [--json]
+    python benchmark.py rag-index [--sizes 10000 100000] [--queries 200] [--json]
+
+Pass --offline to replace Gemini and SerpAPI with local simulators (no API keys needed);
+simulated latency scales with prompt and output tokens, so relative numbers are meaningful
+but absolute ones are not.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+# Keep benchmark runs from reading or polluting the real caches
+os.environ.setdefault("COPILOT_CACHE_DIR", tempfile.mkdtemp(prefix="copilot-bench-"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _SimulatedResponse:
+    def __init__(self, text: str, usage: _Usage, chunks: List[str] = None):
+        self.text = text
+        self.usage_metadata = usage
+        self._chunks = chunks or [text]
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield _Chunk(chunk)
+
+
+class SimulatedGeminiModel:
+    """Stand-in for genai.GenerativeModel: latency grows with prompt and output size"""
+
+    WORDS_PER_SECTION = 350
+
+    def __init__(self, base_latency: float = 0.4, per_input_token: float = 0.00005, per_output_token: float = 0.004):
+        self.base_latency = base_latency
+        self.per_input_token = per_input_token
+        self.per_output_token = per_output_token
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        # One output section per requested heading, so fused prompts produce both sections
+        sections = ["## AI ANALYSIS", "## EXECUTIVE SUMMARY"] if "## EXECUTIVE SUMMARY" in prompt else [""]
+        body = " ".join(["insight"] * self.WORDS_PER_SECTION)
+        text = "\n\n".join(f"{heading}\n{body}".strip() for heading in sections)
+        usage = _Usage(estimate_tokens(prompt), estimate_tokens(text))
+        time.sleep(self.base_latency + usage.prompt_token_count * self.per_input_token
+                   + usage.candidates_token_count * self.per_output_token)
+        return _SimulatedResponse(text, usage)
+
+
+def simulated_serpapi(params: Dict[str, Any]) -> Dict[str, Any]:
+    query = params.get("q", "")
+    return {
+        "search_information": {"total_results": 1000, "query_displayed": query, "time_taken_displayed": "0.4s"},
+        "organic_results": [
+            {"title": f"{query} result {i}", "link": f"https://example.com/{i}",
+             "snippet": f"An overview of {query} covering approach {i} in detail.", "displayed_link": f"example.com/{i}"}
+            for i in range(10)
+        ],
+        "related_searches": [{"query": f"{query} tutorial"}, {"query": f"{query} research"}],
+    }
+
+
+def make_copilot(offline: bool):
+    from research_copilot import AdvancedResearchCopilot
+
+    copilot = AdvancedResearchCopilot()
+    if offline:
+        copilot.model = SimulatedGeminiModel()
+        copilot.serpapi_available = True
+        copilot._serpapi_request = simulated_serpapi
+    return copilot
+
+
+def bench_workflow_modes(args):
+    """Compare the standard (analysis → summary) workflow with the fused single-call mode"""
+    copilot = make_copilot(args.offline)
+    modes = ["standard", "fused"]
+    stats = {mode: {"latency": [], "calls": 0, "prompt_tokens": 0, "output_tokens": 0} for mode in modes}
+
+    for topic in args.topics:
+        # Warm the search cache so both modes pay the same (zero) search cost
+        copilot.serpapi_search(topic)
+        for mode in modes:
+            for _ in range(args.repeat):
+                # Drop cached generations so every run reaches the model
+                copilot.generation_cache.clear()
+                before = dict(copilot.token_usage)
+                start = time.perf_counter()
+                copilot.research_workflow(topic, save_to_notion=False, use_real_time=True, mode=mode,
+                                          reuse_similar=False)
+                stats[mode]["latency"].append(time.perf_counter() - start)
+                for key in ("calls", "prompt_tokens", "output_tokens"):
+                    stats[mode][key] += copilot.token_usage[key] - before[key]
+
+    runs = len(args.topics) * args.repeat
+    print("\n📊 WORKFLOW MODE BENCHMARK" + (" (offline simulation)" if args.offline else ""))
+    print("=" * 72)
+    print(f"{'mode':<10}{'runs':>6}{'p50 s':>9}{'mean s':>9}{'LLM calls':>11}{'in tok/run':>12}{'out tok/run':>13}")
+    for mode in modes:
+        s = stats[mode]
+        print(f"{mode:<10}{runs:>6}{statistics.median(s['latency']):>9.2f}{statistics.mean(s['latency']):>9.2f}"
+              f"{s['calls'] / runs:>11.1f}{s['prompt_tokens'] / runs:>12.0f}{s['output_tokens'] / runs:>13.0f}")
+
+    standard, fused = stats["standard"], stats["fused"]
+    standard_latency = statistics.mean(standard["latency"])
+    latency_saved = standard_latency - statistics.mean(fused["latency"])
+    standard_tokens = standard["prompt_tokens"] + standard["output_tokens"]
+    tokens_saved = standard_tokens - (fused["prompt_tokens"] + fused["output_tokens"])
+    print("-" * 72)
+    print(f"Fused mode saves {latency_saved:.2f}s per run ({latency_saved / standard_latency:.0%} of latency)")
+    if standard_tokens:
+        print(f"Fused mode saves {tokens_saved / runs:.0f} tokens per run ({tokens_saved / standard_tokens:.0%} of tokens)")
+
+
+class FakeNotionServer:
+    """Local stand-in for the Notion API: fixed latency, a request-rate ceiling and random 5xx errors"""
+
+    def __init__(self, latency: float = 0.35, max_rate: float = 10.0, fail_rate: float = 0.0):
+        self.latency = latency
+        self.max_rate = max_rate
+        self.fail_rate = fail_rate
+        self.counts = {"pages": 0, "appends": 0, "rate_limited": 0, "errors": 0}
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _admit(self) -> str:
+        """Decide whether a request succeeds, is rate limited or fails"""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_rate:
+                self.counts["rate_limited"] += 1
+                return "rate_limited"
+            self._recent.append(now)
+            if random.random() < self.fail_rate:
+                self.counts["errors"] += 1
+                return "error"
+        return "ok"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, body: Dict[str, Any], headers: Dict[str, str] = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _handle(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                outcome = server._admit()
+                if outcome == "rate_limited":
+                    return self._reply(429, {"object": "error", "status": 429, "code": "rate_limited",
+                                             "message": "Rate limited"}, {"Retry-After": "1"})
+                time.sleep(server.latency)
+                if outcome == "error":
+                    return self._reply(502, {"object": "error", "status": 502, "code": "internal_server_error",
+                                             "message": "Bad gateway"})
+                if self.path.startswith("/v1/pages"):
+                    with server._lock:
+                        server.counts["pages"] += 1
+                    return self._reply(200, {"object": "page", "id": str(uuid.uuid4())})
+                with server._lock:
+                    server.counts["appends"] += 1
+                return self._reply(200, {"object": "list", "results": []})
+
+            do_POST = do_PATCH = _handle
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def bench_notion_bulk(args):
+    """Sequential create_notion_page calls vs. create_notion_pages_bulk against a fake Notion server"""
+    from notion_client import Client
+
+    copilot = make_copilot(offline=True)
+    content = "\n\n".join(f"## Section {i}\n- point one\n- point two\n\nSome **findings** here." for i in range(5))
+    items = [{"title": f"Bench page {i}", "content": content, "tags": ["benchmark"]} for i in range(args.pages)]
+
+    with FakeNotionServer(args.latency, args.server_rate, args.fail_rate) as server:
+        # Client-side retries off so failures surface to the copilot's own retry logic
+        copilot.notion = Client(auth="benchmark", base_url=server.url, retry=False, log_level=logging.ERROR)
+        copilot.notion_database_id = "benchmark-db"
+        copilot.notion_available = True
+        # Bulk writes share the copilot's notion limit; pace it to the fake server instead of Notion
+        copilot.configure_service_limits(rate_limits={"notion": args.rate})
+
+        sequential_items = items[:args.sequential_pages]
+        start = time.perf_counter()
+        sequential_ok = sum(1 for item in sequential_items
+                            if copilot.create_notion_page(item["title"], item["content"], item["tags"]).startswith("✅"))
+        sequential_elapsed = time.perf_counter() - start
+
+        bulk = copilot.create_notion_pages_bulk(items, max_concurrency=args.concurrency)
+        counts = dict(server.counts)
+
+    sequential_rate = sequential_ok / sequential_elapsed if sequential_elapsed else 0.0
+    print("\n📊 NOTION BULK EXPORT BENCHMARK (local fake Notion server)")
+    print("=" * 72)
+    print(f"server: {args.latency * 1000:.0f} ms latency, {args.server_rate:.0f} req/s ceiling, "
+          f"{args.fail_rate:.0%} random 5xx")
+    print(f"{'mode':<12}{'pages':>7}{'ok':>6}{'failed':>8}{'retried':>9}{'elapsed s':>11}{'pages/s':>10}")
+    print(f"{'sequential':<12}{len(sequential_items):>7}{sequential_ok:>6}{len(sequential_items) - sequential_ok:>8}"
+          f"{0:>9}{sequential_elapsed:>11.2f}{sequential_rate:>10.2f}")
+    print(f"{'bulk':<12}{len(items):>7}{bulk['succeeded']:>6}{bulk['failed']:>8}{bulk['retried']:>9}"
+          f"{bulk['elapsed_s']:>11.2f}{bulk['pages_per_s']:>10.2f}")
+    print("-" * 72)
+    print(f"server saw {counts['pages']} page creates, {counts['appends']} appends, "
+          f"{counts['rate_limited']} rate-limited, {counts['errors']} injected errors")
+    if sequential_rate:
+        print(f"Bulk export is {bulk['pages_per_s'] / sequential_rate:.1f}x the sequential throughput")
+
+
+# Heavy dependencies that should only load when a feature first needs them
+DEFERRED_MODULES = ("google.generativeai", "notion_client", "requests", "numpy", "httpx")
+
+STARTUP_PROBE = """
+import json, sys, time
+{setup}
+start = time.perf_counter()
+{timed}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed_s": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+# name -> (untimed setup, timed code); each run happens in a fresh interpreter so imports are cold
+STARTUP_PROBES = {
+    "import research_copilot": ("", "import research_copilot"),
+    "cli ready": ("", "from research_copilot import AdvancedResearchCopilot\ncopilot = AdvancedResearchCopilot()"),
+    "gemini first use": ("from research_copilot import AdvancedResearchCopilot\ncopilot = AdvancedResearchCopilot()",
+                         "copilot.model"),
+    "app ready": ("", "from streamlit.testing.v1 import AppTest\nAppTest.from_file('app.py', default_timeout=120).run()"),
+}
+
+
+def run_startup_probe(setup: str, timed: str) -> Dict[str, Any]:
+    script = STARTUP_PROBE.format(setup=setup, timed=timed, deferred=DEFERRED_MODULES)
+    env = dict(os.environ)
+    # Construction must not need real credentials; nothing may call Gemini before first use
+    env.setdefault("GEMINI_API_KEY", "benchmark")
+    completed = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                               env=env, capture_output=True, text=True, timeout=300)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "probe failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(args):
+    """Cold import and time-to-ready for the CLI and the Streamlit app, plus what each step loads"""
+    probes = [name for name in STARTUP_PROBES if not args.probes or name in args.probes]
+    results = {}
+    for name in probes:
+        runs = [run_startup_probe(*STARTUP_PROBES[name]) for _ in range(args.repeat)]
+        timings = [run["elapsed_s"] for run in runs]
+        results[name] = {
+            "p50_ms": round(statistics.median(timings) * 1000, 1),
+            "min_ms": round(min(timings) * 1000, 1),
+            "max_ms": round(max(timings) * 1000, 1),
+            "loaded": runs[-1]["loaded"],
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"\n📊 STARTUP BENCHMARK ({args.repeat} fresh interpreter(s) per probe)")
+    print("=" * 72)
+    print(f"{'probe':<26}{'p50 ms':>9}{'min ms':>9}{'max ms':>9}  heavy modules loaded")
+    for name, result in results.items():
+        print(f"{name:<26}{result['p50_ms']:>9.1f}{result['min_ms']:>9.1f}{result['max_ms']:>9.1f}  "
+              f"{', '.join(result['loaded']) or '-'}")
+
+
+def synthetic_chunks(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Single-chunk documents of Zipf-distributed words from a synthetic 20k-word vocabulary"""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10)))
+                  for _ in range(20000)]
+    cumulative, total = [], 0.0
+    for rank in range(len(vocabulary)):
+        total += 1.0 / (rank + 1)
+        cumulative.append(total)
+    return [
+        {"source": f"bench:{i}", "kind": "summary", "title": " ".join(rng.choices(vocabulary, cum_weights=cumulative, k=4)),
+         "text": ". ".join(" ".join(rng.choices(vocabulary, cum_weights=cumulative, k=12)) for _ in range(8))}
+        for i in range(count)
+    ]
+
+
+def bench_rag_index(args):
+    """Vector index build throughput, reopen time, query latency and self-retrieval recall at each size"""
+    from vector_index import VectorIndex
+    rng = random.Random(11)
+    results = {}
+    for size in args.sizes:
+        documents = synthetic_chunks(size)
+        directory = tempfile.mkdtemp(prefix="rag-bench-")
+        index = VectorIndex(directory, dim=args.dim)
+        start = time.perf_counter()
+        for i in range(0, len(documents), args.batch):
+            index.add_documents(documents[i:i + args.batch])
+        build_s = time.perf_counter() - start
+
+        # One more document at full size: the incremental path a research run takes
+        extra = synthetic_chunks(1, seed=size)
+        start = time.perf_counter()
+        index.add_documents(extra)
+        append_ms = (time.perf_counter() - start) * 1000
+        index.close()
+
+        start = time.perf_counter()
+        index = VectorIndex(directory, dim=args.dim)
+        reopen_ms = (time.perf_counter() - start) * 1000
+
+        latencies, found = [], 0
+        for document in rng.sample(documents, min(args.queries, len(documents))):
+            # A few words lifted from one chunk should bring that chunk back
+            words = document["text"].replace(".", "").split()
+            offset = rng.randrange(max(1, len(words) - 8))
+            start = time.perf_counter()
+            hits = index.search(" ".join(words[offset:offset + 8]), k=5)
+            latencies.append(time.perf_counter() - start)
+            found += any(hit["source"] == document["source"] for hit in hits)
+        latencies.sort()
+        stats = index.stats()
+        results[size] = {
+            "chunks": stats["chunks"],
+            "build_s": round(build_s, 2),
+            "chunks_per_s": round(stats["chunks"] / build_s),
+            "append_ms": round(append_ms, 1),
+            "reopen_ms": round(reopen_ms, 1),
+            "vector_mb": round(stats["vector_bytes"] / 1e6, 1),
+            "query_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+            "query_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+            "recall_at_5": round(found / len(latencies), 3),
+        }
+        index.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"\n📊 RAG INDEX BENCHMARK (dim {args.dim}, {args.queries} queries per size)")
+    print("=" * 96)
+    print(f"{'chunks':>8}{'build s':>9}{'chunks/s':>10}{'append ms':>11}{'reopen ms':>11}{'vectors MB':>12}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'recall@5':>10}")
+    for result in results.values():
+        print(f"{result['chunks']:>8}{result['build_s']:>9.2f}{result['chunks_per_s']:>10}{result['append_ms']:>11.1f}"
+              f"{result['reopen_ms']:>11.1f}{result['vector_mb']:>12.1f}{result['query_p50_ms']:>9.2f}"
+              f"{result['query_p95_ms']:>9.2f}{result['recall_at_5']:>10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Research Copilot performance benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    modes = subparsers.add_parser("workflow-modes", help="standard vs. fused research_workflow: latency and tokens")
+    modes.add_argument("--topics", nargs="+", default=["large language model agents", "vector databases"])
+    modes.add_argument("--repeat", type=int, default=2)
+    modes.add_argument("--offline", action="store_true", help="simulate Gemini and SerpAPI locally")
+    modes.set_defaults(func=bench_workflow_modes)
+
+    bulk = subparsers.add_parser("notion-bulk", help="sequential vs. bulk Notion page creation: pages/second")
+    bulk.add_argument("--pages", type=int, default=60)
+    bulk.add_argument("--sequential-pages", type=int, default=20, help="pages written one at a time for the baseline")
+    bulk.add_argument("--concurrency", type=int, default=6)
+    bulk.add_argument("--rate", type=float, default=8.0, help="shared Notion rate limit (requests/second)")
+    bulk.add_argument("--latency", type=float, default=0.35, help="fake server latency per request (seconds)")
+    bulk.add_argument("--server-rate", type=float, default=10.0, help="fake server requests/second before 429s")
+    bulk.add_argument("--fail-rate", type=float, default=0.05, help="fraction of requests answered with a 502")
+    bulk.set_defaults(func=bench_notion_bulk)
+
+    startup = subparsers.add_parser("startup", help="cold import and time-to-ready for the CLI and app")
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.add_argument("--probes", nargs="+", choices=list(STARTUP_PROBES), help="only run these probes")
+    startup.add_argument("--json", action="store_true", help="print machine-readable results for tracking")
+    startup.set_defaults(func=bench_startup)
+
+    rag = subparsers.add_parser("rag-index", help="vector index build time and retrieval latency by index size")
+    rag.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="documents (about one chunk each)")
+    rag.add_argument("--queries", type=int, default=200)
+    rag.add_argument("--dim", type=int, default=384)
+    rag.add_argument("--batch", type=int, default=1000, help="documents per add_documents call while building")
+    rag.add_argument("--json", action="store_true", help="print machine-readable results for tracking")
+    rag.set_defaults(func=bench_rag_index)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Two-tier (memory LRU + SQLite) TTL cache and in-flight request coalescing"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Stable SHA-256 key over JSON-serialisable parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """In-process LRU in front of a size-bounded on-disk SQLite store, with per-entry TTLs
+
+    Values are stored on disk as JSON; pass encode/decode to keep richer objects in memory
+    and convert them to and from JSON-serialisable data at the disk boundary.
+    """
+
+    def __init__(self, path: str = None, namespace: str = "default", memory_size: int = 256,
+                 disk_max_entries: int = 5000, encode: Callable[[Any], Any] = None,
+                 decode: Callable[[Any], Any] = None):
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self.memory_size = memory_size
+        self.disk_max_entries = disk_max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+        # path=None keeps the cache memory-only
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed ON cache_entries (namespace, accessed_at)"
+            )
+            self._db.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a fresh cached value, checking memory first and then disk"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is not None:
+                    if row[1] > now:
+                        value = json.loads(row[0])
+                        if self.decode is not None:
+                            value = self.decode(value)
+                        self._db.execute(
+                            "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                            (now, self.namespace, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, row[1], value)
+                        self._stats["disk_hits"] += 1
+                        return value
+                    self._db.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+                    )
+                    self._db.commit()
+
+            self._stats["misses"] += 1
+            return default
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Store a value in both tiers for ttl seconds (ttl <= 0 disables caching)"""
+        if ttl <= 0:
+            return
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._stats["sets"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(self.encode(value) if self.encode else value, ensure_ascii=False),
+                     expires_at, now)
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _evict_disk(self):
+        """Drop expired rows, then the least recently used ones beyond disk_max_entries"""
+        self._db.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time())
+        )
+        count = self._db.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        overflow = count - self.disk_max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM cache_entries WHERE rowid IN ("
+                "SELECT rowid FROM cache_entries WHERE namespace = ? ORDER BY accessed_at LIMIT ?)",
+                (self.namespace, overflow)
+            )
+            self._stats["evictions"] += overflow
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute(
+                    "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+                ).fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single upstream call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per key at a time; returns (result, shared) where shared means another caller ran it"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -0,0 +1,137 @@
+"""Search result deduplication: canonical URLs plus MinHash near-duplicate detection across queries"""
+import hashlib
+import re
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from search_models import SearchResponse
+
+WORD_PATTERN = re.compile(r"\w+")
+TRACKING_PARAMS = re.compile(
+    r"^(?:utm_\w+|gclid|fbclid|msclkid|igshid|ref|ref_src|mc_cid|mc_eid|_ga|amp|outputtype)$", re.IGNORECASE
+)
+# AMP caches serve a publisher's page under their own host: /c/s/<host>/<path>, /amp/s/<host>/<path>
+GOOGLE_HOST = re.compile(r"^(?:www\.)?google\.[a-z.]+$")
+AMP_CACHE_PATH = re.compile(r"^/(?:[cv]/|amp/)(?:s/)?([^/]+)(/.*)?$")
+# Mobile and AMP mirrors of the canonical host
+MIRROR_HOST_PREFIX = re.compile(r"^(?:www|amp|m|mobile)\.")
+# AMP variants of an article path: /amp/story, /story/amp, /story.amp, /story.amp.html
+AMP_PATH = re.compile(r"^/amp(?=/)|/amp$|\.amp(?=\.html?$|$)")
+
+SHINGLE_SIZE = 3
+# Bottom-k MinHash: a signature keeps the SIGNATURE_SIZE smallest shingle hashes
+SIGNATURE_SIZE = 32
+NEAR_DUPLICATE_THRESHOLD = 0.6
+
+
+def canonical_url(url: str) -> str:
+    """Scheme-less canonical form of url, so mirrors and tracking variants of one page compare equal.
+
+    Lowercases the host and drops www/m/amp prefixes, unwraps AMP cache URLs and AMP article
+    paths, and removes fragments, tracking params, default ports and trailing slashes.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    if not parts.netloc:
+        return url.strip()
+    host = re.sub(r":(?:80|443)$", "", parts.netloc.lower())
+    path = parts.path
+    if host.endswith(".cdn.ampproject.org") or (GOOGLE_HOST.match(host) and path.startswith("/amp/")):
+        match = AMP_CACHE_PATH.match(path)
+        if match:
+            host, path = match.group(1).lower(), match.group(2) or ""
+    host = MIRROR_HOST_PREFIX.sub("", host)
+    path = AMP_PATH.sub("", path).rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(k)))
+    return f"{host}{path}" + (f"?{query}" if query else "")
+
+
+def _shingles(text: str) -> set:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """Bottom-k MinHash signature of text's word shingles (empty for text without words).
+
+    One hash per shingle instead of one per permutation keeps this cheap enough to run on
+    every search; texts with at most SIGNATURE_SIZE shingles get an exact signature.
+    """
+    hashes = {int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+              for shingle in _shingles(text)}
+    return tuple(sorted(hashes)[:SIGNATURE_SIZE])
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    if not first or not second:
+        return 0.0
+    # The smallest hashes of the union are a uniform sample of it; count how many both sets share
+    union = sorted(set(first).union(second))[:SIGNATURE_SIZE]
+    shared = set(first).intersection(second)
+    return sum(1 for value in union if value in shared) / len(union)
+
+
+class ResultDeduper:
+    """Drops results whose canonical URL was already seen or whose text nearly matches a kept one.
+
+    One deduper spans every response passed to it, so a story repeated across the queries
+    feeding one prompt is kept only where it first appears (news before web results, rank order).
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._urls = set()
+        self._signatures: List[Tuple[int, ...]] = []
+        # Signature value -> kept signatures containing it; only those can be similar
+        self._postings: Dict[int, List[int]] = {}
+
+    def _near_duplicate(self, signature: Tuple[int, ...]) -> bool:
+        candidates = {index for value in signature for index in self._postings.get(value, ())}
+        return any(similarity(signature, self._signatures[index]) >= self.threshold for index in candidates)
+
+    def _keep(self, item) -> str:
+        """Why item is a duplicate, or "" after remembering it as kept"""
+        url = canonical_url(item.link)
+        if url and url in self._urls:
+            return "url_duplicates"
+        signature = minhash(f"{item.title} {item.snippet}")
+        if signature and self._near_duplicate(signature):
+            return "near_duplicates"
+        if url:
+            self._urls.add(url)
+        if signature:
+            for value in signature:
+                self._postings.setdefault(value, []).append(len(self._signatures))
+            self._signatures.append(signature)
+        return ""
+
+    def dedupe(self, response: SearchResponse) -> Tuple[SearchResponse, Dict[str, int]]:
+        """(response without duplicates, counts of what was removed and the text bytes it saved)"""
+        counts = {"results": 0, "url_duplicates": 0, "near_duplicates": 0, "bytes_saved": 0}
+        kept = {"news_results": [], "organic_results": []}
+        for field in ("news_results", "organic_results"):
+            for item in getattr(response, field):
+                counts["results"] += 1
+                reason = self._keep(item)
+                if reason:
+                    counts[reason] += 1
+                else:
+                    kept[field].append(item)
+        if not counts["url_duplicates"] and not counts["near_duplicates"]:
+            return response, counts
+        deduped = SearchResponse(
+            total_results=response.total_results,
+            query_displayed=response.query_displayed,
+            time_taken=response.time_taken,
+            organic_results=kept["organic_results"],
+            news_results=kept["news_results"],
+            related_searches=response.related_searches,
+            error=response.error,
+        )
+        counts["bytes_saved"] = len(response.text().encode("utf-8")) - len(deduped.text().encode("utf-8"))
+        return deduped, counts
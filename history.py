@@ -0,0 +1,346 @@
+"""Persistent research history: SQLite or JSONL backends behind a bounded in-memory view"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+# Session owner of a JSONL entry, stored alongside its fields
+OWNER_FIELD = "_owner"
+
+
+def _entry_type(entry: Dict[str, Any]) -> str:
+    return entry.get("type") or "research"
+
+
+def _entry_topic(entry: Dict[str, Any]) -> str:
+    return str(entry.get("topic") or entry.get("query") or entry.get("content") or entry.get("type") or "")
+
+
+def _entry_time(entry: Dict[str, Any]) -> float:
+    try:
+        return datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+class SQLiteHistoryBackend:
+    """Append-only table with type/time/topic columns indexed for paged queries"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT NOT NULL, topic TEXT NOT NULL, "
+            "created_at REAL NOT NULL, entry TEXT NOT NULL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(history)")}
+        if "owner" not in columns:
+            # Stores from before entries were attributed to app sessions
+            self._db.execute("ALTER TABLE history ADD COLUMN owner TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_type_time ON history (type, created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_time ON history (created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_owner ON history (owner, id)")
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict[str, Any], owner: str = None) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO history (type, topic, created_at, entry, owner) VALUES (?, ?, ?, ?, ?)",
+                (_entry_type(entry), _entry_topic(entry), _entry_time(entry),
+                 json.dumps(entry, ensure_ascii=False, default=str), owner)
+            )
+        return cursor.lastrowid
+
+    def _where(self, type: str = None, topic: str = None, since: float = None, until: float = None,
+               owner: str = None):
+        clauses, params = [], []
+        if owner:
+            clauses.append("owner = ?")
+            params.append(owner)
+        if type:
+            clauses.append("type = ?")
+            params.append(type)
+        if topic:
+            clauses.append("topic LIKE ? ESCAPE '\\'")
+            params.append("%" + topic.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit: int = 20, offset: int = 0, newest_first: bool = True, **filters) -> List[Dict[str, Any]]:
+        where, params = self._where(**filters)
+        order = "DESC" if newest_first else "ASC"
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT entry FROM history{where} ORDER BY id {order} LIMIT ? OFFSET ?", params + [limit, offset]
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM history{where}", params).fetchone()[0]
+
+    def prune(self, max_entries: int = None, max_age: float = None) -> int:
+        removed = 0
+        with self._lock:
+            if max_age is not None:
+                removed += self._db.execute("DELETE FROM history WHERE created_at < ?", (time.time() - max_age,)).rowcount
+            if max_entries is not None:
+                removed += self._db.execute(
+                    "DELETE FROM history WHERE id <= (SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (max_entries,)
+                ).rowcount
+        return removed
+
+    def clear(self, owner: str = None):
+        where, params = self._where(owner=owner)
+        with self._lock:
+            self._db.execute(f"DELETE FROM history{where}", params)
+
+
+class JSONLHistoryBackend:
+    """Append-only JSON Lines file plus an in-memory index of (offset, type, topic, time, owner) per entry.
+
+    Queries filter on the index and only read the matching lines; pruning rewrites the file.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: List[tuple] = []
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                offset = f.tell()
+                for line in iter(f.readline, b""):
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A partially written last line from an interrupted run
+                        offset = f.tell()
+                        continue
+                    owner = entry.pop(OWNER_FIELD, None)
+                    self._index.append((offset, _entry_type(entry), _entry_topic(entry).lower(), _entry_time(entry),
+                                        owner))
+                    offset = f.tell()
+
+    def append(self, entry: Dict[str, Any], owner: str = None) -> int:
+        stored = dict(entry, **{OWNER_FIELD: owner}) if owner else entry
+        line = (json.dumps(stored, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+            self._index.append((offset, _entry_type(entry), _entry_topic(entry).lower(), _entry_time(entry), owner))
+            return len(self._index)
+
+    def _matching(self, type: str = None, topic: str = None, since: float = None, until: float = None,
+                  owner: str = None) -> List[tuple]:
+        topic = topic.lower() if topic else None
+        return [
+            item for item in self._index
+            if (not owner or item[4] == owner) and (not type or item[1] == type) and (not topic or topic in item[2])
+            and (since is None or item[3] >= since) and (until is None or item[3] < until)
+        ]
+
+    def query(self, limit: int = 20, offset: int = 0, newest_first: bool = True, **filters) -> List[Dict[str, Any]]:
+        with self._lock:
+            matching = self._matching(**filters)
+            if newest_first:
+                matching.reverse()
+            selected = matching[offset:offset + limit]
+            entries = []
+            if selected:
+                with open(self.path, "rb") as f:
+                    for item in selected:
+                        f.seek(item[0])
+                        entry = json.loads(f.readline())
+                        entry.pop(OWNER_FIELD, None)
+                        entries.append(entry)
+        return entries
+
+    def count(self, **filters) -> int:
+        with self._lock:
+            return len(self._matching(**filters)) if filters else len(self._index)
+
+    def prune(self, max_entries: int = None, max_age: float = None) -> int:
+        with self._lock:
+            keep = self._index
+            if max_age is not None:
+                cutoff = time.time() - max_age
+                keep = [item for item in keep if item[3] >= cutoff]
+            if max_entries is not None:
+                keep = keep[-max_entries:] if max_entries else []
+            removed = len(self._index) - len(keep)
+            if removed:
+                self._rewrite(keep)
+        return removed
+
+    def _rewrite(self, keep: List[tuple]):
+        temp_path = self.path + ".tmp"
+        index = []
+        with open(self.path, "rb") as source, open(temp_path, "wb") as target:
+            for item in keep:
+                source.seek(item[0])
+                index.append((target.tell(),) + item[1:])
+                target.write(source.readline())
+        os.replace(temp_path, self.path)
+        self._index = index
+
+    def clear(self, owner: str = None):
+        with self._lock:
+            if owner:
+                self._rewrite([item for item in self._index if item[4] != owner])
+                return
+            open(self.path, "wb").close()
+            self._index = []
+
+
+class ConversationHistory:
+    """List-like research history: recent entries in a ring buffer, everything else in the backend.
+
+    Supports the list operations the app relies on (append, clear, len, truthiness, indexing,
+    slicing, iteration) plus paged, filtered queries. Retention (max_entries / max_age
+    seconds) is applied on startup and every `prune_every` appends. With an owner, the
+    history only sees (and clears) that owner's entries; see scoped().
+    """
+
+    def __init__(self, backend, memory_size: int = 50, max_entries: int = None, max_age: float = None,
+                 prune_every: int = 100, owner: str = None):
+        self.backend = backend
+        self.owner = owner
+        self._filters = {"owner": owner} if owner else {}
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._appends = 0
+        self._recent: deque = deque(maxlen=memory_size)
+        self._count = 0
+        self.prune()
+
+    def prune(self) -> int:
+        """Apply the retention policy; returns how many entries were dropped"""
+        removed = 0
+        if self.max_entries is not None or self.max_age is not None:
+            removed = self.backend.prune(self.max_entries, self.max_age)
+        with self._lock:
+            self._recent = deque(reversed(self.backend.query(limit=self._recent.maxlen, **self._filters)),
+                                 maxlen=self._recent.maxlen)
+            self._count = self.backend.count(**self._filters)
+        return removed
+
+    def scoped(self, owner: str) -> "ConversationHistory":
+        """A view of this store holding only owner's entries (one app user or session)
+
+        The view shares the backend and retention policy, which applies to the whole store.
+        """
+        return ConversationHistory(self.backend, memory_size=self._recent.maxlen, max_entries=self.max_entries,
+                                   max_age=self.max_age, prune_every=self.prune_every, owner=owner)
+
+    def append(self, entry: Dict[str, Any]):
+        entry = dict(entry)
+        entry.setdefault("timestamp", datetime.now().isoformat())
+        self.backend.append(entry, owner=self.owner)
+        with self._lock:
+            self._recent.append(entry)
+            self._count += 1
+            self._appends += 1
+            due = self.prune_every and self._appends % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def clear(self):
+        self.backend.clear(owner=self.owner)
+        with self._lock:
+            self._recent.clear()
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._count)
+            if start >= stop:
+                return []
+            return self._range(start, stop)[::step]
+        index = key + self._count if key < 0 else key
+        if not 0 <= index < self._count:
+            raise IndexError("history index out of range")
+        return self._range(index, index + 1)[0]
+
+    def _range(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Entries start..stop in chronological order, from memory when they're recent enough"""
+        with self._lock:
+            buffered = len(self._recent)
+            first_buffered = self._count - buffered
+            if start >= first_buffered:
+                return list(self._recent)[start - first_buffered:stop - first_buffered]
+        return self.backend.query(limit=stop - start, offset=start, newest_first=False, **self._filters)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Oldest first, read from the backend a page at a time"""
+        offset = 0
+        while True:
+            page = self.backend.query(limit=200, offset=offset, newest_first=False, **self._filters)
+            yield from page
+            if len(page) < 200:
+                return
+            offset += len(page)
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Newest entries first"""
+        if limit <= len(self._recent):
+            with self._lock:
+                return list(self._recent)[::-1][:limit]
+        return self.backend.query(limit=limit, **self._filters)
+
+    def page(self, page: int = 1, page_size: int = 20, type: str = None, topic: str = None,
+             since: float = None, until: float = None) -> Dict[str, Any]:
+        """One page of entries (newest first) filtered by type, topic substring and time range"""
+        filters = {"type": type, "topic": topic, "since": since, "until": until}
+        filters = dict({name: value for name, value in filters.items() if value is not None}, **self._filters)
+        total = self.backend.count(**filters)
+        page = max(1, page)
+        return {
+            "entries": self.backend.query(limit=page_size, offset=(page - 1) * page_size, **filters),
+            "page": page,
+            "pages": max(1, -(-total // page_size)),
+            "total": total,
+        }
+
+
+def make_history(cache_dir: str) -> ConversationHistory:
+    """History configured from HISTORY_* environment variables"""
+    backend_name = os.getenv("HISTORY_BACKEND", "sqlite").lower()
+    if backend_name == "jsonl":
+        backend = JSONLHistoryBackend(os.path.join(cache_dir, "history.jsonl"))
+    else:
+        backend = SQLiteHistoryBackend(os.path.join(cache_dir, "history.sqlite3"))
+    retention_days = float(os.getenv("HISTORY_RETENTION_DAYS", "90"))
+    return ConversationHistory(
+        backend,
+        memory_size=int(os.getenv("HISTORY_MEMORY_SIZE", "50")),
+        max_entries=int(os.getenv("HISTORY_MAX_ENTRIES", "5000")),
+        max_age=retention_days * 86400 if retention_days > 0 else None,
+    )
+
@@ -0,0 +1,107 @@
+"""Pooled HTTP client shared by the copilot's outbound API calls"""
+import random
+import threading
+import time
+from typing import Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledHTTPClient:
+    """Keep-alive requests.Session with bounded pools, timeouts and retry/backoff"""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # One adapter per scheme; urllib3 keeps up to pool_size idle connections per host
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "retries": 0, "failures": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _backoff(self, attempt: int, response: requests.Response = None) -> float:
+        """Exponential backoff with full jitter, honouring a numeric Retry-After header"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method: str, url: str, deadline: float = None, **kwargs) -> requests.Response:
+        """Send a request through the pooled session, retrying on connection errors, 429 and 5xx
+
+        With a deadline (a time.monotonic() value) each attempt's timeouts are capped at the time
+        left, and no retry is made that would start after it.
+        """
+        timeout = kwargs.pop("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count("failures")
+                    raise requests.Timeout(f"Deadline passed before attempt {attempt + 1}")
+                kwargs["timeout"] = (tuple(min(part, remaining) for part in timeout) if isinstance(timeout, tuple)
+                                     else min(timeout, remaining))
+            else:
+                kwargs["timeout"] = timeout
+            self._count("requests")
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                time.sleep(delay)
+                continue
+
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                if deadline is None or time.monotonic() + delay < deadline:
+                    self._count("retries")
+                    response.close()
+                    time.sleep(delay)
+                    continue
+
+            if response.status_code >= 400:
+                self._count("failures")
+            return response
+
+    def get(self, url: str, params: Dict[str, Any] = None, **kwargs) -> requests.Response:
+        return self.request("GET", url, params=params, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """Request/retry counters plus new vs. reused connections across live pools"""
+        new_connections = 0
+        pooled_requests = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            new_connections += pool.num_connections
+            pooled_requests += pool.num_requests
+
+        with self._lock:
+            stats = dict(self._counters)
+        stats["new_connections"] = new_connections
+        stats["reused_connections"] = max(0, pooled_requests - new_connections)
+        return stats
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,153 @@
+"""Background jobs: long copilot actions run on a worker pool and are polled by id"""
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "cancelled")
+
+
+class Job:
+    """One submitted action: its status, the output streamed so far, and the result or error"""
+
+    def __init__(self, job_id: str, kind: str, label: str, owner: str = None):
+        self.id = job_id
+        self.kind = kind
+        self.label = label
+        self.owner = owner
+        self.status = "queued"
+        self.message = "Waiting for a worker..."
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._chunks: List[str] = []
+        self._lock = threading.Lock()
+
+    def emit(self, chunk: str):
+        """Append streamed output (safe to call from the worker thread)"""
+        with self._lock:
+            self._chunks.append(chunk)
+
+    def set_message(self, message: str):
+        self.message = message
+
+    @property
+    def output(self) -> str:
+        with self._lock:
+            return "".join(self._chunks)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "label": self.label,
+            "status": self.status,
+            "message": self.message,
+            "output": self.output,
+            "error": self.error,
+            "elapsed_s": round(self.elapsed, 2),
+        }
+
+
+class JobRunner:
+    """Runs fn(job, *args, **kwargs) on a thread pool and keeps jobs addressable by id.
+
+    Jobs outlive the code that submitted them (e.g. a Streamlit script run), so a UI can
+    submit, rerun, and pick up progress and results by polling. Finished jobs are kept for
+    `retention` seconds, at most `max_finished` of them.
+    """
+
+    def __init__(self, max_workers: int = 4, retention: float = 3600.0, max_finished: int = 200):
+        self.retention = retention
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, label: str, fn: Callable[..., Any], *args, owner: str = None, **kwargs) -> str:
+        """Queue fn and return the new job's id"""
+        job = Job(uuid.uuid4().hex[:12], kind, label, owner)
+
+        def run():
+            job.status = "running"
+            job.message = "Running..."
+            job.started_at = time.time()
+            try:
+                job.result = fn(job, *args, **kwargs)
+                status = "done"
+            except Exception as e:
+                job.error = str(e)
+                status = "failed"
+                print(f"job {job.id} ({kind}) failed:\n{traceback.format_exc()}", file=sys.stderr)
+            # finished_at first: anything that sees a finished status can rely on it
+            job.finished_at = time.time()
+            job.message = "Done" if status == "done" else "Failed"
+            job.status = status
+
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(run)
+        self._prune()
+        return job.id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner: str = None, kind: str = None) -> List[Job]:
+        """Matching jobs, newest first"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(
+            (job for job in jobs if (owner is None or job.owner == owner) and (kind is None or job.kind == kind)),
+            key=lambda job: job.created_at, reverse=True
+        )
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that hasn't started yet"""
+        job = self.get(job_id)
+        if job is None or not job.future.cancel():
+            return False
+        job.finished_at = time.time()
+        job.message = "Cancelled"
+        job.status = "cancelled"
+        return True
+
+    def discard(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.done:
+                del self._jobs[job_id]
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if job.done), key=lambda job: job.finished_at)
+            excess = len(finished) - self.max_finished
+            for index, job in enumerate(finished):
+                if index < excess or job.finished_at < cutoff:
+                    del self._jobs[job.id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {status: sum(1 for job in jobs if job.status == status) for status in JOB_STATUSES}
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,146 @@
+"""Convert Gemini markdown into Notion blocks sized for the Notion API limits"""
+import re
+from typing import Any, Dict, List
+
+# Notion API limits
+MAX_TEXT_LENGTH = 2000          # characters per rich_text text object
+MAX_RICH_TEXT_ITEMS = 100       # rich_text objects per block
+MAX_BLOCKS_PER_REQUEST = 100    # children per pages.create / blocks.children.append
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*)$")
+BULLET_PATTERN = re.compile(r"^\s*[-*•+]\s+(.*)$")
+NUMBERED_PATTERN = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+QUOTE_PATTERN = re.compile(r"^\s*>\s?(.*)$")
+DIVIDER_PATTERN = re.compile(r"^\s*([-*_=])(\s*\1){2,}\s*$")
+INLINE_PATTERN = re.compile(r"\*\*(.+?)\*\*|__(.+?)__|`([^`]+)`|\[([^\]]+)\]\((https?://[^)\s]+)\)|(?<!\*)\*(?!\s)(.+?)(?<!\s)\*(?!\*)")
+
+
+def _text(content: str, bold: bool = False, italic: bool = False, code: bool = False, link: str = None) -> List[Dict[str, Any]]:
+    """rich_text objects for one run of text, split at the per-object length limit"""
+    items = []
+    for start in range(0, len(content), MAX_TEXT_LENGTH):
+        item = {"type": "text", "text": {"content": content[start:start + MAX_TEXT_LENGTH], "link": {"url": link} if link else None}}
+        if bold or italic or code:
+            item["annotations"] = {"bold": bold, "italic": italic, "code": code}
+        items.append(item)
+    return items
+
+
+def rich_text(text: str) -> List[Dict[str, Any]]:
+    """Parse inline markdown (bold, italic, code, links) into Notion rich_text objects"""
+    items = []
+    position = 0
+    for match in INLINE_PATTERN.finditer(text):
+        if match.start() > position:
+            items.extend(_text(text[position:match.start()]))
+        bold, bold_alt, code, link_text, link_url, italic = match.groups()
+        if bold or bold_alt:
+            items.extend(_text(bold or bold_alt, bold=True))
+        elif code:
+            items.extend(_text(code, code=True))
+        elif link_text:
+            items.extend(_text(link_text, link=link_url))
+        else:
+            items.extend(_text(italic, italic=True))
+        position = match.end()
+    if position < len(text):
+        items.extend(_text(text[position:]))
+    return items
+
+
+def _block(block_type: str, text: str) -> List[Dict[str, Any]]:
+    """One block, or several if the text needs more rich_text objects than a block allows"""
+    items = rich_text(text)
+    if not items:
+        return []
+    blocks = []
+    for start in range(0, len(items), MAX_RICH_TEXT_ITEMS):
+        body = {"rich_text": items[start:start + MAX_RICH_TEXT_ITEMS]}
+        blocks.append({"object": "block", "type": block_type, block_type: body})
+    return blocks
+
+
+def _code_block(lines: List[str], language: str) -> List[Dict[str, Any]]:
+    code = "\n".join(lines)
+    blocks = []
+    # Notion caps each code block's rich_text like any other block
+    per_block = MAX_TEXT_LENGTH * MAX_RICH_TEXT_ITEMS
+    for start in range(0, max(1, len(code)), per_block):
+        blocks.append({
+            "object": "block",
+            "type": "code",
+            "code": {"rich_text": _text(code[start:start + per_block]) or _text(" "), "language": language or "plain text"},
+        })
+    return blocks
+
+
+def markdown_to_blocks(markdown: str) -> List[Dict[str, Any]]:
+    """Convert markdown (headings, bullets, numbered items, quotes, code, dividers, paragraphs) into blocks"""
+    blocks: List[Dict[str, Any]] = []
+    paragraph: List[str] = []
+    lines = (markdown or "").splitlines()
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.extend(_block("paragraph", "\n".join(paragraph)))
+            paragraph.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i].rstrip()
+        stripped = line.strip()
+
+        if stripped.startswith("```"):
+            flush_paragraph()
+            language = stripped[3:].strip().lower()
+            code_lines = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith("```"):
+                code_lines.append(lines[i])
+                i += 1
+            blocks.extend(_code_block(code_lines, language))
+        elif not stripped:
+            flush_paragraph()
+        elif DIVIDER_PATTERN.match(stripped):
+            flush_paragraph()
+            blocks.append({"object": "block", "type": "divider", "divider": {}})
+        elif HEADING_PATTERN.match(stripped):
+            flush_paragraph()
+            hashes, title = HEADING_PATTERN.match(stripped).groups()
+            level = min(len(hashes), 3)
+            blocks.extend(_block(f"heading_{level}", title.strip().strip("*")))
+        elif BULLET_PATTERN.match(line):
+            flush_paragraph()
+            blocks.extend(_block("bulleted_list_item", BULLET_PATTERN.match(line).group(1)))
+        elif NUMBERED_PATTERN.match(line):
+            flush_paragraph()
+            blocks.extend(_block("numbered_list_item", NUMBERED_PATTERN.match(line).group(1)))
+        elif QUOTE_PATTERN.match(line):
+            flush_paragraph()
+            blocks.extend(_block("quote", QUOTE_PATTERN.match(line).group(1)))
+        else:
+            paragraph.append(stripped)
+        i += 1
+
+    flush_paragraph()
+    return blocks
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def plain_text_blocks(text: str) -> List[Dict[str, Any]]:
+    """Unformatted paragraphs: a fallback for content Notion rejects once parsed"""
+    blocks = []
+    for part in (text or "").split("\n\n"):
+        part = part.strip()
+        if part:
+            for items in _chunks(_text(part), MAX_RICH_TEXT_ITEMS):
+                blocks.append({"object": "block", "type": "paragraph", "paragraph": {"rich_text": items}})
+    return blocks
+
+
+def chunk_blocks(blocks: List[Dict[str, Any]], size: int = MAX_BLOCKS_PER_REQUEST) -> List[List[Dict[str, Any]]]:
+    """Split blocks into the minimum number of request-sized batches"""
+    return _chunks(blocks, size)
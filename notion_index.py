@@ -0,0 +1,288 @@
+"""Local SQLite/FTS5 mirror of the Notion research database"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Block types whose rich_text is worth indexing as body text
+TEXT_BLOCK_TYPES = {
+    "paragraph", "heading_1", "heading_2", "heading_3", "bulleted_list_item", "numbered_list_item",
+    "quote", "callout", "toggle", "to_do", "code",
+}
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _plain_text(rich_text: List[Dict[str, Any]]) -> str:
+    return "".join(item.get("plain_text") or item.get("text", {}).get("content", "") for item in rich_text or [])
+
+
+def page_title(page: Dict[str, Any]) -> str:
+    for prop in page.get("properties", {}).values():
+        if prop.get("type") == "title" or "title" in prop:
+            return _plain_text(prop.get("title")) or "Untitled"
+    return "Untitled"
+
+
+def page_tags(page: Dict[str, Any]) -> List[str]:
+    tags = page.get("properties", {}).get("Tags", {})
+    return [option.get("name", "") for option in tags.get("multi_select") or []]
+
+
+class NotionIndex:
+    """Mirror of one Notion database (title, tags, timestamps, body text) with full-text search.
+
+    sync() pulls only pages edited since each data source's cursor, walking every result
+    page and checkpointing the cursor after each one, so an interrupted sync resumes where
+    it stopped; searches never touch the Notion API. Full syncs, run every
+    full_sync_interval seconds by refresh(), also prune pages deleted in Notion. Every API
+    call runs under limiter() (the copilot's shared notion limit). Pages written by this
+    process can be upserted directly so they are searchable before the next sync.
+    """
+
+    def __init__(self, path: str, notion, database_id: str, limiter: Callable[[], Any] = None,
+                 full_sync_interval: float = 86400.0):
+        self.notion = notion
+        self.database_id = database_id
+        self.limiter = limiter
+        self.full_sync_interval = full_sync_interval
+        self._data_source_ids: Optional[List[str]] = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "id TEXT PRIMARY KEY, database_id TEXT NOT NULL, title TEXT NOT NULL, tags TEXT, url TEXT, "
+            "created_time TEXT, last_edited_time TEXT, body TEXT NOT NULL DEFAULT '')"
+        )
+        self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(id UNINDEXED, title, tags, body)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sync_state (database_id TEXT PRIMARY KEY, cursor TEXT, synced_at REAL)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(sync_state)")}
+        if "full_synced_at" not in columns:
+            self._db.execute("ALTER TABLE sync_state ADD COLUMN full_synced_at REAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS source_cursors ("
+            "database_id TEXT NOT NULL, data_source_id TEXT NOT NULL, cursor TEXT, "
+            "PRIMARY KEY (database_id, data_source_id))"
+        )
+        self._lock = threading.Lock()
+        # Held for a whole sync so overlapping triggers don't fetch the same pages twice
+        self._sync_lock = threading.Lock()
+        self._sync_pending = False
+
+    def _sync_state(self):
+        """(newest cursor, last completed sync, last completed full sync), as epoch seconds"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT cursor, synced_at, full_synced_at FROM sync_state WHERE database_id = ?", (self.database_id,)
+            ).fetchone()
+        return row or (None, None, None)
+
+    def _call(self, method, **kwargs):
+        if self.limiter is None:
+            return method(**kwargs)
+        with self.limiter():
+            return method(**kwargs)
+
+    def _sources(self) -> List[str]:
+        if self._data_source_ids is None:
+            database = self._call(self.notion.databases.retrieve, database_id=self.database_id)
+            self._data_source_ids = [source["id"] for source in database.get("data_sources", [])]
+        return self._data_source_ids
+
+    def _query_batches(self, data_source_id: str, edited_since: str = None):
+        """Result pages (lists of pages) of one data source, edited on/after edited_since, oldest edit first"""
+        query = {"page_size": 100, "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]}
+        if edited_since:
+            # last_edited_time is minute-granular, so re-read the boundary minute
+            query["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": edited_since}}
+        cursor = None
+        while True:
+            response = self._call(self.notion.data_sources.query, data_source_id=data_source_id,
+                                  start_cursor=cursor, **query)
+            yield response.get("results", [])
+            if not response.get("has_more"):
+                break
+            cursor = response.get("next_cursor")
+
+    def _page_body(self, page_id: str) -> str:
+        lines = []
+        cursor = None
+        while True:
+            response = self._call(self.notion.blocks.children.list, block_id=page_id, start_cursor=cursor,
+                                  page_size=100)
+            for block in response.get("results", []):
+                if block.get("type") in TEXT_BLOCK_TYPES:
+                    text = _plain_text(block[block["type"]].get("rich_text"))
+                    if text:
+                        lines.append(text)
+            if not response.get("has_more"):
+                break
+            cursor = response.get("next_cursor")
+        return "\n".join(lines)
+
+    def upsert_page(self, page: Dict[str, Any], body: str = None):
+        """Store (or replace) one page; body=None keeps the body already indexed"""
+        title = page_title(page)
+        tags = page_tags(page)
+        with self._lock:
+            if body is None:
+                row = self._db.execute("SELECT body FROM pages WHERE id = ?", (page["id"],)).fetchone()
+                body = row[0] if row else ""
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pages (id, database_id, title, tags, url, created_time, last_edited_time, body) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (page["id"], self.database_id, title, json.dumps(tags), page.get("url"),
+                     page.get("created_time"), page.get("last_edited_time"), body)
+                )
+                self._db.execute("DELETE FROM pages_fts WHERE id = ?", (page["id"],))
+                self._db.execute("INSERT INTO pages_fts (id, title, tags, body) VALUES (?, ?, ?, ?)",
+                                 (page["id"], title, " ".join(tags), body))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def remove_page(self, page_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+            self._db.execute("DELETE FROM pages_fts WHERE id = ?", (page_id,))
+
+    def _source_cursors(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT data_source_id, cursor FROM source_cursors WHERE database_id = ?", (self.database_id,)
+            ).fetchall())
+
+    def _save_cursor(self, data_source_id: str, cursor: Optional[str]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO source_cursors (database_id, data_source_id, cursor) VALUES (?, ?, ?)",
+                (self.database_id, data_source_id, cursor)
+            )
+
+    def sync(self, full: bool = False) -> Dict[str, Any]:
+        """Pull pages edited since the last sync (or every page, pruning deleted ones, with full=True)
+
+        Pages whose last_edited_time matches the mirror keep their indexed body, so a full
+        sync (or a resumed one) only re-reads the bodies of pages that changed.
+        """
+        with self._sync_lock:
+            start = time.perf_counter()
+            previous_cursor, _, full_synced_at = self._sync_state()
+            cursors = {} if full else self._source_cursors()
+            # A mirror that has never been walked gets a complete walk, which can prune too
+            full = full or (not cursors and previous_cursor is None)
+            with self._lock:
+                known = dict(self._db.execute(
+                    "SELECT id, last_edited_time FROM pages WHERE database_id = ?", (self.database_id,)
+                ).fetchall())
+            seen = set()
+            updated = 0
+            newest = None
+            for data_source_id in self._sources():
+                cursor = None if full else cursors.get(data_source_id, previous_cursor)
+                for pages in self._query_batches(data_source_id, cursor):
+                    for page in pages:
+                        seen.add(page["id"])
+                        edited = page.get("last_edited_time")
+                        if edited is None or known.get(page["id"]) != edited:
+                            self.upsert_page(page, self._page_body(page["id"]))
+                            updated += 1
+                        if edited and (cursor is None or edited > cursor):
+                            cursor = edited
+                    # Results come oldest edit first, so everything up to cursor is mirrored
+                    self._save_cursor(data_source_id, cursor)
+                if cursor and (newest is None or cursor > newest):
+                    newest = cursor
+
+            removed = 0
+            if full:
+                # Only pages mirrored before this walk began: newer ones may not have been listed yet
+                stale = [page_id for page_id in known if page_id not in seen]
+                for page_id in stale:
+                    self.remove_page(page_id)
+                removed = len(stale)
+
+            now = time.time()
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sync_state (database_id, cursor, synced_at, full_synced_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (self.database_id, newest or previous_cursor, now, now if full else full_synced_at)
+                )
+            return {"updated": updated, "removed": removed, "full": full,
+                    "elapsed_s": round(time.perf_counter() - start, 3)}
+
+    def refresh(self, max_age: float, executor=None) -> bool:
+        """Sync if the mirror is older than max_age; returns whether a sync has ever completed
+
+        With an executor the sync runs there and callers never wait for it: until the first
+        one completes they should search Notion live. Without one it runs inline. Once the
+        last full sync is older than full_sync_interval, the sync is a full one.
+        """
+        _, synced_at, full_synced_at = self._sync_state()
+        now = time.time()
+        full = synced_at is not None and (full_synced_at is None or now - full_synced_at > self.full_sync_interval)
+        if synced_at is not None and now - synced_at <= max_age and not full:
+            return True
+        if executor is None:
+            self.sync(full=full)
+            return True
+        with self._lock:
+            if self._sync_pending:
+                return synced_at is not None
+            self._sync_pending = True
+        executor.submit(self._background_sync, full)
+        return synced_at is not None
+
+    def _background_sync(self, full: bool = False):
+        try:
+            self.sync(full=full)
+        except Exception as e:
+            print(f"notion-index: sync failed: {str(e)[:120]}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._sync_pending = False
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Best-matching pages by BM25 over title, tags and body (title matches weigh most)"""
+        terms = TOKEN_PATTERN.findall(query.lower())
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"*' for term in terms)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT p.id, p.title, p.tags, p.url, p.last_edited_time, "
+                "snippet(pages_fts, 3, '', '', ' … ', 12) "
+                "FROM pages_fts JOIN pages p ON p.id = pages_fts.id "
+                "WHERE pages_fts MATCH ? AND p.database_id = ? "
+                "ORDER BY bm25(pages_fts, 0.0, 10.0, 5.0, 1.0) LIMIT ?",
+                (match, self.database_id, limit)
+            ).fetchall()
+        return [
+            {"id": row[0], "title": row[1], "tags": json.loads(row[2] or "[]"), "url": row[3],
+             "last_edited_time": row[4], "snippet": row[5]}
+            for row in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        cursor, synced_at, full_synced_at = self._sync_state()
+        with self._lock:
+            pages = self._db.execute(
+                "SELECT COUNT(*) FROM pages WHERE database_id = ?", (self.database_id,)
+            ).fetchone()[0]
+        return {
+            "pages": pages,
+            "cursor": cursor,
+            "last_sync_age_s": round(time.time() - synced_at, 1) if synced_at else None,
+            "last_full_sync_age_s": round(time.time() - full_synced_at, 1) if full_synced_at else None,
+        }
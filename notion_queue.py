@@ -0,0 +1,256 @@
+"""Durable write-behind queue for Notion page creation"""
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Notion error codes that will fail the same way on every retry
+PERMANENT_ERROR_CODES = {"validation_error", "unauthorized", "restricted_resource", "object_not_found", "invalid_json"}
+# Transient failures worth retrying in place
+RETRYABLE_STATUSES = {409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_CODES = {"rate_limited", "conflict_error", "internal_server_error", "service_unavailable",
+                         "gateway_timeout", "notionhq_client_request_timeout"}
+
+
+class NotionPartialWrite(Exception):
+    """A page was created but not all of its body was appended.
+
+    progress ({"page_id", "batches_written", "plain_text"}) lets a later attempt append
+    the rest instead of creating the page again. code, status and headers are the
+    underlying error's, so retry and rate-limit handling see the real cause.
+    """
+
+    def __init__(self, progress: Dict[str, Any], error: Exception):
+        super().__init__(f"Page {progress['page_id']} written up to batch {progress['batches_written']}: {error}")
+        self.progress = progress
+        self.error = error
+        self.code = getattr(error, "code", None)
+        self.status = getattr(error, "status", None)
+        self.headers = getattr(error, "headers", None)
+
+
+class NotionWriteQueue:
+    """SQLite-backed queue of page writes, drained by a background worker thread.
+
+    Jobs survive restarts. A claimed job holds a lease that the worker renews while it
+    writes, so a worker that dies mid-write leaves the job to be picked up again once the
+    lease expires (also making it safe for several copilot instances to share one queue
+    file). Every claim counts as an attempt. Failures are retried with exponential backoff,
+    honouring Notion's Retry-After on rate limits. A writer that raises NotionPartialWrite
+    is called again with resume=<its progress>, to finish that page.
+    """
+
+    def __init__(self, path: str, writer: Callable[..., Any], max_attempts: int = 5,
+                 base_delay: float = 2.0, max_delay: float = 300.0, lease_seconds: float = 120.0,
+                 poll_interval: float = 1.0):
+        self.writer = writer
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS notion_jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, content TEXT NOT NULL, tags TEXT, "
+            "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, next_attempt_at REAL NOT NULL, lease_until REAL, "
+            "completed_at REAL, last_error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_notion_jobs_due ON notion_jobs (status, next_attempt_at)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(notion_jobs)")}
+        if "progress" not in columns:
+            # Queue files from before partial writes were resumable
+            self._db.execute("ALTER TABLE notion_jobs ADD COLUMN progress TEXT")
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # Set when Notion answers rate_limited: the whole worker backs off, not just that job
+        self._paused_until = 0.0
+
+    def enqueue(self, title: str, content: str, tags: List[str] = None) -> int:
+        """Persist a page write and wake the worker; returns the job id"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO notion_jobs (title, content, tags, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+                (title, content or "", json.dumps(tags) if tags else None, now, now)
+            )
+        self._wake.set()
+        return cursor.lastrowid
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="notion-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically lease the next due job, counting the attempt as it starts
+
+        Counting on claim means a job whose lease expired (the worker died mid-write)
+        used up an attempt too; once it has none left it is failed instead of reclaimed.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._db.execute(
+                        "SELECT id, title, content, tags, attempts, progress FROM notion_jobs "
+                        "WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                        "OR (status = 'in_progress' AND lease_until < ?) ORDER BY id LIMIT 1",
+                        (now, now)
+                    ).fetchone()
+                    if row is None or row[4] < self.max_attempts:
+                        break
+                    self._db.execute(
+                        "UPDATE notion_jobs SET status = 'failed', lease_until = NULL, "
+                        "last_error = 'Lease expired on the last attempt (worker stopped mid-write)' WHERE id = ?",
+                        (row[0],)
+                    )
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE notion_jobs SET status = 'in_progress', attempts = attempts + 1, lease_until = ? "
+                        "WHERE id = ?",
+                        (now + self.lease_seconds, row[0])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "title": row[1], "content": row[2],
+                "tags": json.loads(row[3]) if row[3] else None, "attempts": row[4] + 1,
+                "progress": json.loads(row[5]) if row[5] else None}
+
+    def _renew_lease(self, job_id: int):
+        with self._lock:
+            self._db.execute(
+                "UPDATE notion_jobs SET lease_until = ? WHERE id = ? AND status = 'in_progress'",
+                (time.time() + self.lease_seconds, job_id)
+            )
+
+    def _keep_leased(self, job_id: int, done: threading.Event):
+        """Renew the job's lease until done is set, so a slow, rate-limited write is not taken over"""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                self._renew_lease(job_id)
+            except sqlite3.Error as e:
+                print(f"notion-writer: lease renewal failed for job #{job_id}: {e}", file=sys.stderr)
+
+    def _retry_delay(self, error: Exception, attempts: int) -> float:
+        headers = getattr(error, "headers", None) or {}
+        retry_after = str(headers.get("retry-after", headers.get("Retry-After", "")))
+        if retry_after.replace(".", "", 1).isdigit():
+            return min(float(retry_after), self.max_delay)
+        return min(self.max_delay, self.base_delay * (2 ** (attempts - 1))) * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            pause = self._paused_until - time.time()
+            if pause > 0:
+                self._stop.wait(pause)
+                continue
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"notion-writer: queue error: {e}", file=sys.stderr)
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._process(job)
+
+    def _process(self, job: Dict[str, Any]):
+        attempts = job["attempts"]
+        done = threading.Event()
+        renewer = threading.Thread(target=self._keep_leased, args=(job["id"], done), name="notion-writer-lease",
+                                   daemon=True)
+        renewer.start()
+        try:
+            if job["progress"]:
+                self.writer(job["title"], job["content"], job["tags"], resume=job["progress"])
+            else:
+                self.writer(job["title"], job["content"], job["tags"])
+        except Exception as e:
+            # notion_client error codes are str enums; compare on the raw value
+            code = getattr(getattr(e, "code", None), "value", getattr(e, "code", None))
+            permanent = code in PERMANENT_ERROR_CODES or attempts >= self.max_attempts
+            status = "failed" if permanent else "pending"
+            delay = 0 if permanent else self._retry_delay(e, attempts)
+            next_attempt = time.time() + delay
+            if code == "rate_limited" or getattr(e, "status", None) == 429:
+                self._paused_until = next_attempt
+            progress = e.progress if isinstance(e, NotionPartialWrite) else job["progress"]
+            with self._lock:
+                self._db.execute(
+                    "UPDATE notion_jobs SET status = ?, attempts = ?, next_attempt_at = ?, lease_until = NULL, "
+                    "last_error = ?, progress = ? WHERE id = ?",
+                    (status, attempts, next_attempt, str(e)[:500], json.dumps(progress) if progress else None,
+                     job["id"])
+                )
+            print(f"notion-writer: job #{job['id']} attempt {attempts} failed ({status}): {str(e)[:120]}", file=sys.stderr)
+            return
+        finally:
+            done.set()
+
+        with self._lock:
+            self._db.execute(
+                "UPDATE notion_jobs SET status = 'done', attempts = ?, completed_at = ?, lease_until = NULL, "
+                "last_error = NULL WHERE id = ?",
+                (attempts, time.time(), job["id"])
+            )
+
+    def retry_failed(self) -> int:
+        """Move failed jobs back to pending; returns how many were requeued"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE notion_jobs SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'failed'",
+                (time.time(),)
+            )
+        self._wake.set()
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, lag of the oldest waiting job, and done/failed/retry counts"""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM notion_jobs GROUP BY status").fetchall())
+            oldest = self._db.execute(
+                "SELECT MIN(created_at) FROM notion_jobs WHERE status IN ('pending', 'in_progress')"
+            ).fetchone()[0]
+            retries = self._db.execute(
+                "SELECT COALESCE(SUM(attempts - 1), 0) FROM notion_jobs WHERE attempts > 1"
+            ).fetchone()[0]
+            last_error = self._db.execute(
+                "SELECT last_error FROM notion_jobs WHERE last_error IS NOT NULL ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return {
+            "depth": counts.get("pending", 0) + counts.get("in_progress", 0),
+            "in_progress": counts.get("in_progress", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "retries": retries,
+            "lag_s": round(now - oldest, 1) if oldest else 0.0,
+            "last_error": last_error[0] if last_error else None,
+            "worker_alive": bool(self._thread and self._thread.is_alive()),
+        }
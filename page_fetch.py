@@ -0,0 +1,278 @@
+"""Full text of search hits: concurrent, per-host-limited, size-capped page fetches with main-text extraction"""
+import codecs
+import re
+import threading
+import time
+from concurrent.futures import Executor, wait
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from cache import TieredCache, make_cache_key
+from dedup import canonical_url
+from ratelimit import ServiceLimiter
+
+CHUNK_SIZE = 64 * 1024
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_TYPES = HTML_TYPES + ("text/plain",)
+# Elements whose text is never main content
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form",
+             "iframe", "button", "select", "figure"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+              "blockquote", "pre", "table", "tr", "td", "th", "dd", "dt", "br", "hr", "figcaption"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+CONTAINER_TAGS = {"article", "main"}
+# Paragraphs shorter than this are usually bylines, buttons and menu entries
+MIN_BLOCK_WORDS = 6
+# Blocks mostly made of link text are navigation, tag clouds and "related" lists
+MAX_LINK_DENSITY = 0.5
+# Trust <article>/<main> alone once it holds this much text
+MIN_CONTAINER_CHARS = 500
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.IGNORECASE)
+USER_AGENT = "Mozilla/5.0 (compatible; ResearchCopilot/1.0)"
+
+
+class _MainTextParser(HTMLParser):
+    """Collects (text, tag, inside article/main, link density) per block of visible text"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks: List[Tuple[str, str, bool, float]] = []
+        self._in_title = False
+        self._skip = 0
+        self._container = 0
+        self._link = 0
+        self._block_tag = ""
+        self._parts: List[str] = []
+        self._link_chars = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "a":
+            self._link += 1
+        if tag in BLOCK_TAGS:
+            self._flush()
+            self._block_tag = tag
+        if tag in CONTAINER_TAGS:
+            self._container += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag == "a":
+            self._link = max(0, self._link - 1)
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if tag in CONTAINER_TAGS:
+            self._container = max(0, self._container - 1)
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip:
+            self._parts.append(data)
+            if self._link:
+                self._link_chars += len(data.strip())
+
+    def _flush(self):
+        text = " ".join("".join(self._parts).split())
+        if text:
+            self.blocks.append((text, self._block_tag, self._container > 0, self._link_chars / len(text)))
+        self._parts = []
+        self._link_chars = 0
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_main_text(html: str, max_chars: int = 20000) -> Tuple[str, str]:
+    """(title, main text) of an HTML page, without scripts, navigation, link lists and short fragments.
+
+    Paragraph-level blocks are kept in document order; when the page marks up an <article> or
+    <main> with enough text, only its blocks are used. The text is capped at max_chars.
+    """
+    parser = _MainTextParser()
+    parser.feed(html)
+    parser.close()
+    blocks = [
+        (text, contained) for text, tag, contained, link_density in parser.blocks
+        if link_density <= MAX_LINK_DENSITY
+        and (len(text.split()) >= MIN_BLOCK_WORDS or (tag in HEADING_TAGS and len(text.split()) >= 2))
+    ]
+    if sum(len(text) for text, contained in blocks if contained) >= MIN_CONTAINER_CHARS:
+        blocks = [block for block in blocks if block[1]]
+
+    kept: List[str] = []
+    seen = set()
+    used = 0
+    for text, _ in blocks:
+        if text in seen:
+            continue
+        seen.add(text)
+        if used + len(text) > max_chars:
+            if max_chars - used > 200:
+                kept.append(text[:max_chars - used].rsplit(" ", 1)[0] + " ...")
+            break
+        kept.append(text)
+        used += len(text) + 2
+    return " ".join(parser.title.split()), "\n\n".join(kept)
+
+
+class PageFetcher:
+    """Fetches and extracts pages through a pooled HTTP client, at most per_host requests per host at once.
+
+    Bodies are streamed and cut off at max_bytes. Extracted documents are cached by canonical
+    URL together with the response's ETag / Last-Modified; once older than fresh_for seconds
+    a cached page is revalidated with a conditional request, and a 304 reuses the stored text
+    without downloading or parsing the page again.
+    """
+
+    def __init__(self, http, cache: TieredCache, per_host: int = 2, max_bytes: int = 2_000_000,
+                 max_chars: int = 20000, timeout: float = 10.0, fresh_for: float = 3600.0,
+                 ttl: float = 7 * 86400.0):
+        self.http = http
+        self.cache = cache
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.fresh_for = fresh_for
+        self.ttl = ttl
+        self._limiters: Dict[str, ServiceLimiter] = {}
+        self._lock = threading.Lock()
+        self._counters = {"fetched": 0, "cache_hits": 0, "not_modified": 0, "errors": 0, "truncated": 0,
+                          "bytes_downloaded": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _limiter(self, host: str) -> ServiceLimiter:
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = ServiceLimiter(max_concurrency=self.per_host)
+            return limiter
+
+    def _failed(self, url: str, error: str, count: bool = True) -> Dict[str, Any]:
+        if count:
+            self._count("errors")
+        return {"url": url, "title": "", "text": "", "status": "error", "error": error}
+
+    def _read(self, response, deadline: float = None) -> Tuple[bytes, bool]:
+        """Up to max_bytes of the streamed body, and whether it was cut off; gives up at the deadline"""
+        chunks, size = [], 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Deadline passed while reading the page")
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                return b"".join(chunks)[:self.max_bytes], True
+        return b"".join(chunks), False
+
+    @staticmethod
+    def _charset(content_type: str, body: bytes) -> str:
+        match = re.search(r"charset=([\w.:-]+)", content_type, re.IGNORECASE)
+        declared = match.group(1) if match else None
+        if declared is None:
+            meta = META_CHARSET.search(body[:4096])
+            declared = meta.group(1).decode("ascii") if meta else None
+        try:
+            return codecs.lookup(declared).name if declared else "utf-8"
+        except LookupError:
+            return "utf-8"
+
+    def fetch(self, url: str, deadline: float = None) -> Dict[str, Any]:
+        """Extracted page as {url, title, text, status, ...}; status is fetched, cached, not_modified or error
+
+        With a deadline (a time.monotonic() value) the request, its retries and the body download
+        stop at that time, including time spent waiting for a per-host slot.
+        """
+        key = make_cache_key("page", canonical_url(url))
+        cached = self.cache.get(key)
+        if cached is not None and time.time() - cached["fetched_at"] < self.fresh_for:
+            self._count("cache_hits")
+            return dict(cached, status="cached")
+
+        headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.1"}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            with self._limiter(urlsplit(url).netloc.lower()):
+                response = self.http.get(url, headers=headers, stream=True, timeout=self.timeout,
+                                         deadline=deadline)
+                try:
+                    if response.status_code == 304 and cached is not None:
+                        page = dict(cached, fetched_at=time.time())
+                        self.cache.set(key, page, self.ttl)
+                        self._count("not_modified")
+                        return dict(page, status="not_modified")
+                    if response.status_code >= 400:
+                        return self._failed(url, f"HTTP {response.status_code}")
+                    content_type = response.headers.get("Content-Type", "")
+                    media_type = content_type.split(";")[0].strip().lower()
+                    if media_type and media_type not in TEXT_TYPES:
+                        return self._failed(url, f"Unsupported content type {media_type}")
+                    body, truncated = self._read(response, deadline)
+                    final_url = response.url
+                    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+                finally:
+                    response.close()
+        except Exception as e:
+            return self._failed(url, str(e))
+
+        # Parse outside the per-host slot: extraction is CPU work, not a request to that host
+        self._count("bytes_downloaded", len(body))
+        if truncated:
+            self._count("truncated")
+        document = body.decode(self._charset(content_type, body), errors="replace")
+        if media_type == "text/plain":
+            title, text = "", document[:self.max_chars].strip()
+        else:
+            title, text = extract_main_text(document, self.max_chars)
+        page = {"url": url, "final_url": final_url, "title": title, "text": text, "etag": etag,
+                "last_modified": last_modified, "fetched_at": time.time(), "truncated": truncated}
+        if text:
+            self.cache.set(key, page, self.ttl)
+        self._count("fetched")
+        return dict(page, status="fetched")
+
+    def fetch_many(self, urls: List[str], executor: Executor, deadline: float = None) -> List[Dict[str, Any]]:
+        """fetch() each distinct URL concurrently on executor; pages not loaded within deadline seconds count as errors
+
+        Queued fetches are cancelled at the deadline, and running ones are handed the same deadline,
+        so they also give up then (within one socket read) instead of holding a worker and a
+        per-host slot for the full per-request timeout.
+        """
+        distinct: Dict[str, str] = {}
+        for url in urls:
+            distinct.setdefault(canonical_url(url), url)
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        futures = [executor.submit(self.fetch, url, deadline_at) for url in distinct.values()]
+        wait(futures, timeout=deadline)
+        pages = []
+        for url, future in zip(distinct.values(), futures):
+            if future.done():
+                try:
+                    pages.append(future.result())
+                except Exception as e:
+                    pages.append(self._failed(url, str(e)))
+            else:
+                # A fetch that already started stops at the deadline and counts its own error
+                pages.append(self._failed(url, f"Timed out after {deadline:.0f}s", count=future.cancel()))
+        return pages
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
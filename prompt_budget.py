@@ -0,0 +1,278 @@
+"""Token-aware prompt context: count tokens, compact search results and pasted text, fit a per-call budget"""
+import re
+import zlib
+from typing import Any, Dict, List, Tuple
+
+# Letters, digit runs and single symbols; long words and numbers cost more than one token
+TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+WORD_PATTERN = re.compile(r"\w+")
+# Emoji, dingbats and box drawing used as decoration by format_search_results and terminal output
+DECORATION = re.compile("[\u2300-\u2bff\U0001f000-\U0001faff\ufe0f\u200d]+ ?")
+RULE_LINE = re.compile(r"^[-=_*~#•·—–\s]{3,}$")
+URL_PATTERN = re.compile(r"https?://(?:www\.)?([^/\s)\]]+)[^\s)\]]*")
+# Display-only lines that carry no information for the model
+BOILERPLATE_LINE = re.compile(
+    r"^(?:(?:Date|Source|URL|Link):\s*(?:Unknown(?: date)?|N/?A)?|Summary:\s*No summary available"
+    r"|Search Results \([\d,]+ results found\)|Search time:.*|Query:.*)$",
+    re.IGNORECASE
+)
+# SerpAPI appends these to snippets when some query words weren't matched
+SNIPPET_NOISE = re.compile(r"\s*(?:Missing|Must include):.*$")
+# Markdown headings, numbered section titles ("2.1 Methods") and ALL-CAPS title lines
+HEADING_LINE = re.compile(r"^(?:#{1,6}\s|\d+(?:\.\d+)*\.?\s+[A-Z][^.!?]{0,80}$|[A-Z][A-Z0-9 ,:&/-]{3,80}$)")
+# CJK full stops end a sentence without a following space
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])\s*")
+# Lines shorter than this (normalized) may legitimately repeat, e.g. section headings
+MIN_DEDUPE_LENGTH = 40
+NEAR_DUPLICATE = 0.9
+
+
+def count_tokens(text: str) -> int:
+    """Approximate Gemini token count without a network call.
+
+    Short words and symbols are one token, longer words one per 7 letters, digits one per 3.
+    Close enough to budget prompts; Gemini's usage metadata has the exact figures.
+    """
+    tokens = 0
+    for piece in TOKEN_PIECE.findall(text or ""):
+        if piece[0].isdigit():
+            tokens += -(-len(piece) // 3)
+        elif piece.isalpha():
+            tokens += -(-len(piece) // 7)
+        else:
+            tokens += 1
+    return tokens
+
+
+def _normalized(text: str) -> str:
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def _truncate(text: str, budget: int) -> str:
+    """Leading words of text that fit in budget tokens"""
+    words = []
+    used = 0
+    for word in text.split(" "):
+        cost = count_tokens(word)
+        if used + cost > budget:
+            break
+        words.append(word)
+        used += cost
+    return " ".join(words)
+
+
+def compact_text(text: str) -> str:
+    """Drop decoration, rules, boilerplate lines and repeated lines; shorten URLs to their host"""
+    lines: List[str] = []
+    seen = set()
+    for line in (text or "").splitlines():
+        line = " ".join(URL_PATTERN.sub(r"\1", DECORATION.sub("", line)).split())
+        if not line:
+            if lines and lines[-1]:
+                lines.append("")
+            continue
+        if RULE_LINE.match(line) or BOILERPLATE_LINE.match(line):
+            continue
+        key = _normalized(line)
+        if len(key) >= MIN_DEDUPE_LENGTH:
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def fit_text(text: str, budget: int, compact: bool = True) -> str:
+    """compact_text(), then keep the head and tail within budget tokens and mark what was cut
+
+    With compact=False (user-supplied text) the lines are kept verbatim, indentation included,
+    and only the head/tail cut applies.
+    """
+    compacted = compact_text(text) if compact else text
+    total = count_tokens(compacted)
+    if total <= budget:
+        return compacted
+    lines = compacted.split("\n")
+    # Introductions and conclusions carry the most summary-worthy content
+    head_budget = budget * 2 // 3
+    head, used = [], 0
+    for line in lines:
+        cost = count_tokens(line)
+        if used + cost > head_budget:
+            partial = _truncate(line, head_budget - used)
+            if not partial and head_budget > used:
+                # A first word longer than the budget, or text without spaces (e.g. CJK)
+                partial = _windows(line, head_budget - used)[0]
+            if partial:
+                head.append(partial + " ...")
+                used += count_tokens(partial)
+            break
+        head.append(line)
+        used += cost
+    tail: List[str] = []
+    for line in reversed(lines[len(head):]):
+        cost = count_tokens(line)
+        if used + cost > budget:
+            break
+        tail.insert(0, line)
+        used += cost
+    marker = f"[... {total - used} tokens omitted for length ...]"
+    return "\n".join(head + ["", marker, ""] + tail).strip("\n")
+
+
+def _search_items(search_data: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(section, line) per news/web result in display order, without near-duplicate snippets"""
+    items = []
+    kept_titles = set()
+    kept_snippets: List[set] = []
+    results = [("News", item) for item in search_data.get("news_results", [])]
+    results += [("Web results", item) for item in search_data.get("organic_results", [])]
+    for section, item in results:
+        title = " ".join((item.get("title") or "").split())
+        snippet = SNIPPET_NOISE.sub("", " ".join((item.get("snippet") or "").split()))
+        title_key = _normalized(title)
+        words = set(_normalized(snippet).split())
+        # The same story syndicated across sites shows up with the same title or snippet
+        if title_key and title_key in kept_titles:
+            continue
+        if words and any(len(words & other) / len(words | other) >= NEAR_DUPLICATE for other in kept_snippets):
+            continue
+        kept_titles.add(title_key)
+        if words:
+            kept_snippets.append(words)
+
+        host = item.get("displayed_link") or URL_PATTERN.sub(r"\1", item.get("link") or "")
+        meta = ", ".join(part for part in (item.get("source") or host.split(" ")[0], item.get("date")) if part)
+        line = f"- {title}" + (f" ({meta})" if meta else "")
+        if snippet and _normalized(snippet) != title_key:
+            line += f": {snippet}"
+        items.append((section, line))
+    return items
+
+
+def fit_search_results(search_data: Dict[str, Any], budget: int) -> str:
+    """Search results as compact prompt context: one line per result, deduplicated, within budget tokens.
+
+    Results are kept in rank order; ones that don't fit are dropped and counted.
+    """
+    sections: Dict[str, List[str]] = {}
+    used = omitted = 0
+    for section, line in _search_items(search_data):
+        cost = count_tokens(line) + (0 if section in sections else count_tokens(section) + 1)
+        if used + cost > budget:
+            omitted += 1
+            continue
+        sections.setdefault(section, []).append(line)
+        used += cost
+
+    parts = [f"{section}:\n" + "\n".join(lines) for section, lines in sections.items()]
+    related = search_data.get("related_searches") or []
+    if related:
+        line = "Related searches: " + "; ".join(related)
+        if used + count_tokens(line) <= budget:
+            parts.append(line)
+    if omitted:
+        parts.append(f"({omitted} lower-ranked results omitted to fit the token budget)")
+    return "\n\n".join(parts) if parts else "No search results."
+
+
+def _blocks(text: str) -> List[str]:
+    """Paragraphs of text, with every heading line starting a new one"""
+    blocks: List[str] = []
+    current: List[str] = []
+    for line in text.splitlines():
+        if not line.strip() or HEADING_LINE.match(line.strip()):
+            if current:
+                blocks.append("\n".join(current))
+            current = [line] if line.strip() else []
+        else:
+            current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def _windows(text: str, max_tokens: int) -> List[str]:
+    """text in consecutive windows of at most max_tokens (at least one), cut at whitespace where possible
+
+    Text without whitespace (CJK, long identifiers) is cut between characters instead.
+    """
+    windows = []
+    start = used = 0
+    space = None  # (offset, tokens before it) of the last whitespace in the current window
+    for match in TOKEN_PIECE.finditer(text):
+        if match.start() > start and text[match.start() - 1].isspace():
+            space = (match.start(), used)
+        cost = count_tokens(match.group())
+        if used and used + cost > max_tokens:
+            cut, before = space or (match.start(), used)
+            windows.append(text[start:cut].strip())
+            start, used, space = cut, used - before, None
+            if used and used + cost > max_tokens:
+                windows.append(text[start:match.start()].strip())
+                start, used = match.start(), 0
+        # A single piece over the budget: a letter or digit run longer than max_tokens allows
+        step = max(1, max_tokens) * (3 if match.group()[0].isdigit() else 7)
+        while cost > max_tokens:
+            windows.append(text[start:start + step])
+            start += step
+            cost = count_tokens(text[start:match.end()])
+        used += cost
+    windows.append(text[start:].strip())
+    return [window for window in windows if window]
+
+
+def _pieces(block: str, max_tokens: int) -> List[str]:
+    """block, or its sentences (and windows of over-long sentences) when it exceeds max_tokens"""
+    if count_tokens(block) <= max_tokens:
+        return [block]
+    pieces = []
+    for sentence in SENTENCE_END.split(block):
+        if count_tokens(sentence) > max_tokens:
+            pieces.extend(_windows(sentence, max_tokens))
+        elif sentence:
+            pieces.append(sentence)
+    return pieces
+
+
+def split_sections(text: str, max_tokens: int) -> List[str]:
+    """Split text into chunks of at most max_tokens along headings, then paragraphs, then sentences.
+
+    Cut points are content-defined: before a heading, or after a paragraph whose hash selects
+    it, once a chunk holds a quarter of max_tokens. Editing one part of a document therefore
+    only changes the chunks around the edit, and the rest keep their content (and cache keys).
+    """
+    min_tokens = max_tokens // 4
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for block in _blocks(text):
+        is_heading = bool(HEADING_LINE.match(block.split("\n", 1)[0].strip()))
+        for piece in _pieces(block, max_tokens):
+            cost = count_tokens(piece)
+            if current and (used + cost > max_tokens or (is_heading and used >= min_tokens)):
+                chunks.append("\n\n".join(current))
+                current, used = [], 0
+            is_heading = False
+            current.append(piece)
+            used += cost
+            if used >= min_tokens and zlib.crc32(piece.encode("utf-8")) % 4 == 0:
+                chunks.append("\n\n".join(current))
+                current, used = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def pack(texts: List[str], max_tokens: int) -> List[List[str]]:
+    """Consecutive groups of texts, each group within max_tokens (a larger text gets its own group)"""
+    groups: List[List[str]] = []
+    used = 0
+    for text in texts:
+        cost = count_tokens(text)
+        if not groups or used + cost > max_tokens:
+            groups.append([])
+            used = 0
+        groups[-1].append(text)
+        used += cost
+    return groups
@@ -0,0 +1,103 @@
+"""Per-service concurrency caps and token-bucket rate limiting"""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then take them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take `tokens` now, going into debt if needed; returns the seconds to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+
+class ServiceLimiter:
+    """Context manager bounding one upstream service by concurrency and/or request rate.
+
+    Both limits are optional; with neither set, entering the limiter is free. `async with`
+    waits without blocking the event loop and shares the same caps with threaded callers.
+    """
+
+    def __init__(self, max_concurrency: int = None, rate: float = None):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self._semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._bucket = TokenBucket(rate) if rate else None
+
+    def __enter__(self):
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+        if self._bucket is not None:
+            self._bucket.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._semaphore is not None:
+            self._semaphore.release()
+        return False
+
+    async def __aenter__(self):
+        if self._semaphore is not None:
+            # Polled: a thread blocked in acquire() would hold the slot after its task was cancelled
+            while not self._semaphore.acquire(blocking=False):
+                await asyncio.sleep(0.05)
+        if self._bucket is not None:
+            try:
+                await asyncio.sleep(self._bucket.reserve())
+            except BaseException:
+                self.__exit__(None, None, None)
+                raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return self.__exit__(*exc_info)
+
+
+class LimiterChain:
+    """Enters several limiters in order, e.g. a caller's own pacing plus the shared service cap"""
+
+    def __init__(self, *limiters):
+        self.limiters = limiters
+
+    def __enter__(self):
+        entered = []
+        try:
+            for limiter in self.limiters:
+                limiter.__enter__()
+                entered.append(limiter)
+        except BaseException:
+            for limiter in reversed(entered):
+                limiter.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        for limiter in reversed(self.limiters):
+            limiter.__exit__(*exc_info)
+        return False
@@ -0,0 +1,275 @@
+"""Pluggable search backends with parallel fan-out, a latency deadline and merged, deduplicated ranking"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from dedup import canonical_url
+from search_models import SearchResponse, SearchResult
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Reciprocal rank fusion constant: damps the advantage of the very top ranks
+RRF_K = 60
+
+
+class SearchBackend:
+    """One source of search results; subclasses set name and implement search()"""
+    name = "backend"
+
+    def available(self) -> bool:
+        return True
+
+    def search(self, query: str, num_results: int = 10) -> SearchResponse:
+        raise NotImplementedError
+
+
+class SerpAPIBackend(SearchBackend):
+    """Google results through the copilot's cached, pooled and rate-limited SerpAPI client"""
+    name = "serpapi"
+
+    def __init__(self, copilot):
+        self.copilot = copilot
+
+    def available(self) -> bool:
+        return self.copilot.serpapi_available
+
+    def search(self, query: str, num_results: int = 10) -> SearchResponse:
+        return self.copilot.serpapi_search(query, num_results)
+
+
+class NotionIndexBackend(SearchBackend):
+    """Pages from the local mirror of the Notion research database"""
+    name = "notion"
+
+    def __init__(self, copilot):
+        self.copilot = copilot
+
+    def available(self) -> bool:
+        return self.copilot.notion_index is not None
+
+    def search(self, query: str, num_results: int = 10) -> SearchResponse:
+        index = self.copilot.notion_index
+        try:
+            if not index.refresh(self.copilot.notion_index_sync_interval, self.copilot.executor):
+                # Nothing mirrored until the first background sync completes
+                return SearchResponse(query_displayed=query)
+        except Exception as e:
+            # A stale mirror is still worth searching
+            print(f"notion-index: refresh failed: {str(e)[:120]}", file=sys.stderr)
+        pages = index.search(query, limit=num_results)
+        return SearchResponse(
+            total_results=len(pages),
+            query_displayed=query,
+            organic_results=[
+                SearchResult(page["title"], page.get("url") or "", page.get("snippet") or "", "notion.so",
+                             (page.get("last_edited_time") or "")[:10])
+                for page in pages
+            ],
+        )
+
+
+class CorpusBackend(SearchBackend):
+    """Full-text index (SQLite FTS5) over a directory of local .md/.txt/.rst documents.
+
+    The index lives at index_path and is refreshed from file mtimes at most every
+    rescan_interval seconds, so only new or changed files are re-read.
+    """
+    name = "corpus"
+    EXTENSIONS = (".md", ".markdown", ".txt", ".rst")
+
+    def __init__(self, directory: str, index_path: str, rescan_interval: float = 60.0):
+        self.directory = os.path.abspath(directory)
+        self.rescan_interval = rescan_interval
+        self._scanned_at = None
+        self._lock = threading.Lock()
+        index_dir = os.path.dirname(index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self._db = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL)")
+        self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(path UNINDEXED, title, body)")
+
+    def available(self) -> bool:
+        return os.path.isdir(self.directory)
+
+    def _files(self) -> Dict[str, Tuple[float, int]]:
+        files = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.lower().endswith(self.EXTENSIONS):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files[path] = (stat.st_mtime, stat.st_size)
+        return files
+
+    def refresh(self, force: bool = False) -> int:
+        """Index new and changed files and drop deleted ones; returns how many files changed"""
+        with self._lock:
+            if not force and self._scanned_at is not None and time.monotonic() - self._scanned_at < self.rescan_interval:
+                return 0
+            files = self._files()
+            known = {row[0]: (row[1], row[2]) for row in self._db.execute("SELECT path, mtime, size FROM documents")}
+            changed = [path for path, signature in files.items() if known.get(path) != signature]
+            removed = [path for path in known if path not in files]
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for path in removed + changed:
+                    self._db.execute("DELETE FROM documents WHERE path = ?", (path,))
+                    self._db.execute("DELETE FROM documents_fts WHERE path = ?", (path,))
+                for path in changed:
+                    with open(path, encoding="utf-8", errors="replace") as f:
+                        body = f.read()
+                    self._db.execute("INSERT INTO documents (path, mtime, size) VALUES (?, ?, ?)", (path,) + files[path])
+                    self._db.execute("INSERT INTO documents_fts (path, title, body) VALUES (?, ?, ?)",
+                                     (path, self._title(path, body), body))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._scanned_at = time.monotonic()
+            return len(changed) + len(removed)
+
+    @staticmethod
+    def _title(path: str, body: str) -> str:
+        for line in body.splitlines():
+            line = line.strip().lstrip("#").strip()
+            if line:
+                return line[:200]
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def search(self, query: str, num_results: int = 10) -> SearchResponse:
+        self.refresh()
+        terms = TOKEN_PATTERN.findall(query.lower())
+        rows = []
+        if terms:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT path, title, snippet(documents_fts, 2, '', '', ' … ', 24) FROM documents_fts "
+                    "WHERE documents_fts MATCH ? ORDER BY bm25(documents_fts, 0.0, 5.0, 1.0) LIMIT ?",
+                    (" OR ".join(f'"{term}"*' for term in terms), num_results)
+                ).fetchall()
+        return SearchResponse(
+            total_results=len(rows),
+            query_displayed=query,
+            organic_results=[
+                SearchResult(title, "file://" + path, " ".join(snippet.split()), os.path.relpath(path, self.directory))
+                for path, title, snippet in rows
+            ],
+        )
+
+
+def merge_responses(responses: List[Tuple[str, SearchResponse]], num_results: int,
+                    weights: Dict[str, float] = None) -> SearchResponse:
+    """One response from several backends' results: deduplicated by canonical URL, ranked by weighted RRF.
+
+    A result found by several backends scores the sum of its reciprocal ranks, so agreement
+    between backends lifts it; the duplicate with the longest snippet is kept.
+    """
+    weights = weights or {}
+    merged: Dict[str, Dict[str, Any]] = {}
+    news: Dict[str, Any] = {}
+    related: List[str] = []
+    for name, response in responses:
+        weight = weights.get(name, 1.0)
+        for rank, item in enumerate(response.organic_results):
+            key = canonical_url(item.link) or item.title.lower()
+            entry = merged.setdefault(key, {"score": 0.0, "item": item, "backends": []})
+            entry["score"] += weight / (RRF_K + rank + 1)
+            entry["backends"].append(name)
+            if len(item.snippet) > len(entry["item"].snippet):
+                entry["item"] = item
+        for item in response.news_results:
+            news.setdefault(canonical_url(item.link) or item.title.lower(), item)
+        related.extend(query for query in response.related_searches if query not in related)
+
+    ranked = sorted(merged.values(), key=lambda entry: entry["score"], reverse=True)[:num_results]
+    primary = responses[0][1]
+    return SearchResponse(
+        total_results=primary.total_results,
+        query_displayed=primary.query_displayed,
+        time_taken=primary.time_taken,
+        organic_results=[
+            SearchResult(entry["item"].title, entry["item"].link, entry["item"].snippet,
+                         entry["item"].displayed_link, entry["item"].date, ",".join(entry["backends"]))
+            for entry in ranked
+        ],
+        news_results=list(news.values()),
+        related_searches=related,
+    )
+
+
+class SearchRouter:
+    """Fans a query out to every available backend in parallel and merges what arrives before the deadline.
+
+    Backends still running at the deadline are left to finish in the background (a late
+    SerpAPI answer still lands in the search cache) but are not waited for.
+    """
+
+    def __init__(self, backends: List[SearchBackend], deadline: float = 8.0, weights: Dict[str, float] = None,
+                 max_workers: int = 8):
+        self.backends = backends
+        self.deadline = deadline
+        self.weights = weights or {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+        self._stats_lock = threading.Lock()
+        self._stats = {backend.name: {"calls": 0, "errors": 0, "timeouts": 0, "latency_sum": 0.0} for backend in backends}
+
+    def available(self) -> List[SearchBackend]:
+        return [backend for backend in self.backends if backend.available()]
+
+    def _timed(self, backend: SearchBackend, query: str, num_results: int) -> SearchResponse:
+        start = time.perf_counter()
+        try:
+            response = backend.search(query, num_results)
+        except Exception as e:
+            response = SearchResponse.failed(f"{backend.name} search error: {str(e)}")
+        self._record(backend.name, "errors" if response.error else None, time.perf_counter() - start)
+        return response
+
+    def _record(self, name: str, outcome: Optional[str], seconds: float = 0.0):
+        with self._stats_lock:
+            stats = self._stats[name]
+            if outcome != "timeouts":
+                stats["calls"] += 1
+                stats["latency_sum"] += seconds
+            if outcome:
+                stats[outcome] += 1
+
+    def search(self, query: str, num_results: int = 10, deadline: float = None) -> SearchResponse:
+        backends = self.available()
+        if not backends:
+            return SearchResponse.failed("No search backend configured")
+        if len(backends) == 1:
+            return self._timed(backends[0], query, num_results)
+
+        futures = {self._executor.submit(self._timed, backend, query, num_results): backend for backend in backends}
+        done, late = wait(futures, timeout=self.deadline if deadline is None else deadline)
+        for future in late:
+            future.cancel()
+        # Keep backend order so the primary (first configured) backend breaks ties
+        responses = [(backend.name, future.result()) for future, backend in futures.items() if future in done]
+        return self.merge(responses, [futures[future].name for future in late], num_results)
+
+    def merge(self, responses: List[Tuple[str, SearchResponse]], late: List[str], num_results: int) -> SearchResponse:
+        """Ranked merge of the (backend name, response) pairs that arrived; late backends missed the deadline"""
+        for name in late:
+            self._record(name, "timeouts")
+        succeeded = [(name, response) for name, response in responses if not response.error]
+        if not succeeded:
+            errors = [response.error for _, response in responses]
+            errors += [f"{name} missed the {self.deadline:.0f}s deadline" for name in late]
+            return SearchResponse.failed("; ".join(errors))
+        return merge_responses(succeeded, num_results, self.weights)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+        for values in stats.values():
+            latency_sum = values.pop("latency_sum")
+            values["avg_ms"] = round(latency_sum / values["calls"] * 1000, 1) if values["calls"] else 0.0
+        return stats
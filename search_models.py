@@ -0,0 +1,226 @@
+"""Compact SerpAPI result model: slotted records with memoized text, markdown and prompt renderings"""
+from typing import Any, Dict, Iterator, List, Tuple
+
+from prompt_budget import fit_search_results
+
+MAX_ORGANIC_RESULTS = 10
+MAX_NEWS_RESULTS = 5
+MAX_RELATED_SEARCHES = 5
+
+
+class _Record:
+    """Read-only mapping access to the public fields, so code written against the old dicts keeps working"""
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key) if key in self._fields else None
+        return default if value is None else value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._fields and getattr(self, key) is not None
+
+    def keys(self) -> Iterator[str]:
+        return (field for field in self._fields if getattr(self, field) is not None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.keys()}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{k}={getattr(self, k)!r}' for k in self.keys())})"
+
+
+class SearchResult(_Record):
+    """One organic web result; backend lists the search backends that returned it (set when merged)"""
+    __slots__ = ("title", "link", "snippet", "displayed_link", "date", "backend")
+    _fields = __slots__
+
+    def __init__(self, title: str = "", link: str = "", snippet: str = "", displayed_link: str = "", date: str = "",
+                 backend: str = ""):
+        self.title = title
+        self.link = link
+        self.snippet = snippet
+        self.displayed_link = displayed_link
+        self.date = date
+        self.backend = backend
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> "SearchResult":
+        return cls(item.get("title") or "", item.get("link") or "", item.get("snippet") or "",
+                   item.get("displayed_link") or "", item.get("date") or "", item.get("backend") or "")
+
+
+class NewsItem(_Record):
+    """One news result"""
+    __slots__ = ("title", "link", "snippet", "source", "date", "thumbnail")
+    _fields = __slots__
+
+    def __init__(self, title: str = "", link: str = "", snippet: str = "", source: str = "", date: str = "",
+                 thumbnail: str = ""):
+        self.title = title
+        self.link = link
+        self.snippet = snippet
+        self.source = source
+        self.date = date
+        self.thumbnail = thumbnail
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> "NewsItem":
+        return cls(item.get("title") or "", item.get("link") or "", item.get("snippet") or "",
+                   item.get("source") or "", item.get("date") or "", item.get("thumbnail") or "")
+
+
+class SearchResponse(_Record):
+    """A parsed search (or the error that replaced it), rendered once per format and reused.
+
+    Responses are shared through the search cache, so treat them as immutable.
+    """
+    __slots__ = ("total_results", "query_displayed", "time_taken", "organic_results", "news_results",
+                 "related_searches", "error", "_rendered")
+    _fields = ("search_information", "organic_results", "news_results", "related_searches", "error")
+
+    def __init__(self, total_results: Any = 0, query_displayed: str = "", time_taken: str = "",
+                 organic_results: Tuple[SearchResult, ...] = (), news_results: Tuple[NewsItem, ...] = (),
+                 related_searches: Tuple[str, ...] = (), error: str = None):
+        self.total_results = total_results
+        self.query_displayed = query_displayed
+        self.time_taken = time_taken
+        self.organic_results = tuple(organic_results)
+        self.news_results = tuple(news_results)
+        self.related_searches = tuple(related_searches)
+        self.error = error
+        self._rendered = None
+
+    @classmethod
+    def from_serpapi(cls, data: Dict[str, Any]) -> "SearchResponse":
+        """Parse a raw SerpAPI response, keeping the top organic, news and related results"""
+        info = data.get("search_information") or {}
+        return cls(
+            total_results=info.get("total_results", 0),
+            query_displayed=info.get("query_displayed", ""),
+            time_taken=info.get("time_taken_displayed", ""),
+            organic_results=[SearchResult.from_dict(item) for item in data.get("organic_results", [])[:MAX_ORGANIC_RESULTS]],
+            news_results=[NewsItem.from_dict(item) for item in data.get("news_results", [])[:MAX_NEWS_RESULTS]],
+            related_searches=[item.get("query", "") for item in data.get("related_searches", [])[:MAX_RELATED_SEARCHES]],
+            error=data.get("error") or None,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SearchResponse":
+        """Rebuild a response from to_dict() output (the parsed-dict layout the search cache stores)"""
+        info = data.get("search_information") or {}
+        return cls(
+            total_results=info.get("total_results", 0),
+            query_displayed=info.get("query_displayed", ""),
+            time_taken=info.get("time_taken", ""),
+            organic_results=[SearchResult.from_dict(item) for item in data.get("organic_results") or []],
+            news_results=[NewsItem.from_dict(item) for item in data.get("news_results") or []],
+            related_searches=data.get("related_searches") or [],
+            error=data.get("error") or None,
+        )
+
+    @classmethod
+    def failed(cls, error: str) -> "SearchResponse":
+        return cls(error=error)
+
+    @classmethod
+    def coerce(cls, data: Any) -> "SearchResponse":
+        return data if isinstance(data, cls) else cls.from_dict(data)
+
+    @property
+    def has_results(self) -> bool:
+        """Whether the search succeeded and returned any web or news results"""
+        return not self.error and bool(self.organic_results or self.news_results)
+
+    @property
+    def search_information(self) -> Dict[str, Any]:
+        return {"total_results": self.total_results, "query_displayed": self.query_displayed,
+                "time_taken": self.time_taken}
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "search_information": self.search_information,
+            "organic_results": [item.to_dict() for item in self.organic_results],
+            "news_results": [item.to_dict() for item in self.news_results],
+            "related_searches": list(self.related_searches),
+        }
+        if self.error:
+            data["error"] = self.error
+        return data
+
+    def _memoized(self, key: Any, render) -> str:
+        if self._rendered is None:
+            self._rendered = {}
+        text = self._rendered.get(key)
+        if text is None:
+            text = self._rendered[key] = render()
+        return text
+
+    def text(self) -> str:
+        """Plain-text rendering for terminals, text areas and search output"""
+        return self._memoized("text", self._render_text)
+
+    def markdown(self) -> str:
+        """Markdown rendering (headings, linked titles) for st.markdown and Notion pages"""
+        return self._memoized("markdown", self._render_markdown)
+
+    def prompt(self, budget: int) -> str:
+        """Compact prompt context within budget tokens (see prompt_budget.fit_search_results)"""
+        return self._memoized(("prompt", budget), lambda: fit_search_results(self, budget))
+
+    def _render_text(self) -> str:
+        if self.error:
+            return f"Search error: {self.error}"
+        lines: List[str] = [
+            f"🔍 Search Results ({self.total_results} results found)",
+            f"Query: {self.query_displayed}",
+            f"Search time: {self.time_taken}",
+            "",
+        ]
+        if self.news_results:
+            lines += ["📰 LATEST NEWS:", "-" * 40]
+            for i, news in enumerate(self.news_results, 1):
+                lines += [
+                    f"{i}. {news.title}",
+                    f"   Source: {news.source or 'Unknown'}",
+                    f"   Date: {news.date or 'Unknown date'}",
+                    f"   Summary: {news.snippet or 'No summary available'}",
+                    f"   Link: {news.link}",
+                    "",
+                ]
+        if self.organic_results:
+            lines += ["🌐 TOP SEARCH RESULTS:", "-" * 40]
+            for i, result in enumerate(self.organic_results, 1):
+                lines += [
+                    f"{i}. {result.title}",
+                    f"   URL: {result.displayed_link or result.link}",
+                    f"   Date: {result.date or 'Unknown date'}",
+                    f"   Summary: {result.snippet or 'No summary available'}",
+                    "",
+                ]
+        if self.related_searches:
+            lines += ["🔗 RELATED SEARCHES:", ", ".join(self.related_searches)]
+        return "\n".join(lines)
+
+    def _render_markdown(self) -> str:
+        if self.error:
+            return f"**Search error:** {self.error}"
+        lines: List[str] = []
+        for heading, items in (("Latest news", self.news_results), ("Top search results", self.organic_results)):
+            if not items:
+                continue
+            lines += [f"## {heading}", ""]
+            for i, item in enumerate(items, 1):
+                title = f"[{item.title}]({item.link})" if item.link.startswith("http") else item.title
+                meta = ", ".join(part for part in (item.get("source") or item.get("displayed_link"), item.date) if part)
+                line = f"{i}. **{title}**" + (f" ({meta})" if meta else "")
+                lines.append(line + (f": {item.snippet}" if item.snippet else ""))
+            lines.append("")
+        if self.related_searches:
+            lines.append(f"**Related searches:** {', '.join(self.related_searches)}")
+        return "\n".join(lines).strip()
@@ -0,0 +1,206 @@
+"""Similarity index over past research topics for reusing near-duplicate workflow results"""
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {"a", "an", "the", "of", "and", "or", "for", "in", "on", "to", "with", "about", "vs", "versus",
+              "research", "latest", "overview", "introduction"}
+# Expanded before vectorizing so "LLM agents" and "large language model agents" share features
+BUILTIN_ACRONYMS = {
+    "ai": "artificial intelligence", "ml": "machine learning", "dl": "deep learning",
+    "llm": "large language model", "nlp": "natural language processing", "rl": "reinforcement learning",
+    "rag": "retrieval augmented generation", "cv": "computer vision", "gnn": "graph neural network",
+    "iot": "internet of things", "ev": "electric vehicle", "vr": "virtual reality", "ar": "augmented reality",
+}
+# "Large Language Models (LLMs)" style definitions, learned from stored summaries
+ACRONYM_DEFINITION = re.compile(r"((?:[A-Za-z][A-Za-z-]*\s+){1,6})\(([A-Z]{2,6})s?\)")
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def learn_acronyms(text: str) -> Dict[str, str]:
+    """Acronym → expansion pairs defined in the text whose initials actually match"""
+    learned = {}
+    for phrase, acronym in ACRONYM_DEFINITION.findall(text or ""):
+        words = WORD_PATTERN.findall(phrase.lower().replace("-", " "))[-len(acronym):]
+        if len(words) == len(acronym) and "".join(w[0] for w in words) == acronym.lower():
+            learned[acronym.lower()] = " ".join(words)
+    return learned
+
+
+class SemanticCache:
+    """Hashed TF-IDF vectors of past topics in a NumPy matrix, persisted in SQLite.
+
+    lookup() finds the most similar earlier topic with one vectorized cosine pass; the
+    caller reuses its result when the similarity clears the threshold and the entry is
+    younger than max_age. Storing a topic that matches an existing entry replaces it.
+    """
+
+    def __init__(self, path: str, dim: int = 4096, max_entries: int = 2000):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.acronyms = dict(BUILTIN_ACRONYMS)
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "stale": 0, "misses": 0, "similarity_sum": 0.0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS research ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, summary TEXT NOT NULL, "
+            "result TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        rows = self._db.execute(
+            "SELECT id, topic, summary, result, created_at FROM research ORDER BY id DESC LIMIT ?", (max_entries,)
+        ).fetchall()
+        self._entries: List[Dict[str, Any]] = [
+            {"id": row[0], "topic": row[1], "summary": row[2], "result": json.loads(row[3]), "created_at": row[4]}
+            for row in reversed(rows)
+        ]
+        for entry in self._entries:
+            for acronym, expansion in learn_acronyms(entry["summary"]).items():
+                self.acronyms.setdefault(acronym, expansion)
+        self._rebuild()
+
+    def _features(self, text: str) -> Dict[str, float]:
+        words = []
+        for word in WORD_PATTERN.findall(text.lower()):
+            expansion = self.acronyms.get(_stem(word)) or self.acronyms.get(word)
+            words.extend(expansion.split() if expansion else [word])
+        features: Dict[str, float] = {}
+        for word in (_stem(w) for w in words if w not in STOP_WORDS):
+            features[word] = features.get(word, 0.0) + 1.0
+            # Character trigrams soften spelling variants without dominating whole-word matches
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                gram = "#" + padded[i:i + 3]
+                features[gram] = features.get(gram, 0.0) + 0.2
+        return features
+
+    def vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in self._features(text).items():
+            # Sublinear term frequency
+            vector[zlib.crc32(feature.encode()) % self.dim] += 1.0 + math.log(count) if count >= 1 else count
+        return vector
+
+    def _rebuild(self):
+        self._matrix = np.zeros((max(len(self._entries), 16), self.dim), dtype=np.float32)
+        for row, entry in enumerate(self._entries):
+            self._matrix[row] = self.vectorize(entry["topic"])
+
+    def _similarities(self, vector: np.ndarray) -> np.ndarray:
+        count = len(self._entries)
+        matrix = self._matrix[:count]
+        # Smoothed IDF over stored topics, so words shared by every topic count for little
+        df = np.count_nonzero(matrix, axis=0)
+        idf = np.log((1.0 + count) / (1.0 + df)) + 1.0
+        weighted = matrix * idf
+        query = vector * idf
+        norms = np.linalg.norm(weighted, axis=1) * np.linalg.norm(query)
+        return np.divide(weighted @ query, norms, out=np.zeros(count, dtype=np.float32), where=norms > 0)
+
+    def lookup(self, topic: str, threshold: float, max_age: float,
+               accept: Callable[[Dict[str, Any]], bool] = None) -> Optional[Dict[str, Any]]:
+        """Most similar stored topic at or above threshold, or None.
+
+        The returned entry carries "similarity", "age_s" and "fresh" (age below max_age);
+        only fresh matches count as hits. Matches whose stored result `accept` rejects
+        count as misses.
+        """
+        with self._lock:
+            self._stats["lookups"] += 1
+            if not self._entries:
+                self._stats["misses"] += 1
+                return None
+            similarities = self._similarities(self.vectorize(topic))
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            entry = self._entries[best]
+            if similarity < threshold or (accept is not None and not accept(entry["result"])):
+                self._stats["misses"] += 1
+                return None
+            age = time.time() - entry["created_at"]
+            fresh = age < max_age
+            if fresh:
+                self._stats["hits"] += 1
+                self._stats["similarity_sum"] += similarity
+            else:
+                self._stats["stale"] += 1
+            return dict(entry, similarity=round(similarity, 3), age_s=round(age, 1), fresh=fresh)
+
+    def add(self, topic: str, summary: str, result: Dict[str, Any], replace_threshold: float = 0.95):
+        """Store a workflow result, replacing an entry for (nearly) the same topic"""
+        now = time.time()
+        with self._lock:
+            # New acronyms only add to the vocabulary; existing expansions are never redefined
+            learned = {k: v for k, v in learn_acronyms(summary).items() if k not in self.acronyms}
+            if learned:
+                self.acronyms.update(learned)
+                self._rebuild()
+
+            vector = self.vectorize(topic)
+            if self._entries:
+                similarities = self._similarities(vector)
+                stale_rows = {int(row) for row in np.flatnonzero(similarities >= replace_threshold)}
+                if stale_rows:
+                    self._delete([self._entries[row]["id"] for row in stale_rows])
+                    keep = [row for row in range(len(self._entries)) if row not in stale_rows]
+                    self._entries = [self._entries[row] for row in keep]
+                    self._matrix[:len(keep)] = self._matrix[keep]
+
+            cursor = self._db.execute(
+                "INSERT INTO research (topic, summary, result, created_at) VALUES (?, ?, ?, ?)",
+                (topic, summary, json.dumps(result, ensure_ascii=False, default=str), now)
+            )
+            self._entries.append({"id": cursor.lastrowid, "topic": topic, "summary": summary,
+                                  "result": result, "created_at": now})
+            if len(self._entries) > self._matrix.shape[0]:
+                # Grow geometrically so appends stay amortized O(1)
+                grown = np.zeros((self._matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                grown[:self._matrix.shape[0]] = self._matrix
+                self._matrix = grown
+            self._matrix[len(self._entries) - 1] = vector
+
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._delete([entry["id"] for entry in self._entries[:overflow]])
+                self._entries = self._entries[overflow:]
+                self._matrix[:len(self._entries)] = self._matrix[overflow:overflow + len(self._entries)]
+
+    def _delete(self, ids: List[int]):
+        self._db.execute(f"DELETE FROM research WHERE id IN ({','.join('?' * len(ids))})", ids)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM research")
+            self._entries = []
+            self._rebuild()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "lookups": stats["lookups"],
+            "hits": stats["hits"],
+            "stale": stats["stale"],
+            "misses": stats["misses"],
+            "hit_rate": stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0,
+            "avg_hit_similarity": round(stats["similarity_sum"] / stats["hits"], 3) if stats["hits"] else 0.0,
+        }
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Checks PageFetcher against a local http.server: per-host cap, size cap, content-type
+rejection, fetch deadline and ETag revalidation. Needs no network or API keys.
+Run directly (python test_page_fetch.py) or with pytest.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import TieredCache
+from http_client import PooledHTTPClient
+from page_fetch import PageFetcher
+
+PARAGRAPH = "<p>The quick brown fox jumps over the lazy dog near the river bank today.</p>"
+PAGE = f"<html><head><title>Fixture page</title></head><body><article>{PARAGRAPH * 20}</article></body></html>"
+SLOW_SECONDS = 5
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves /page/<n> (0.3s each), /big, /report.pdf, /slow and /etag"""
+
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path.startswith("/page/"):
+            with self.lock:
+                FixtureHandler.in_flight += 1
+                FixtureHandler.max_in_flight = max(FixtureHandler.max_in_flight, FixtureHandler.in_flight)
+            time.sleep(0.3)
+            with self.lock:
+                FixtureHandler.in_flight -= 1
+            self._send(200, "text/html; charset=utf-8", PAGE.encode("utf-8"))
+        elif self.path == "/big":
+            self._send(200, "text/html", (PAGE * 200).encode("utf-8"))
+        elif self.path == "/report.pdf":
+            self._send(200, "application/pdf", b"%PDF-1.4 " * 100)
+        elif self.path == "/slow":
+            time.sleep(SLOW_SECONDS)
+            self._send(200, "text/html", PAGE.encode("utf-8"))
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+            else:
+                self._send(200, "text/html", PAGE.encode("utf-8"), {"ETag": '"v1"'})
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def fixture_url(path: str) -> str:
+    """URL of path on the fixture server, started on a free port on first use"""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{_server.server_port}{path}"
+
+
+def make_fetcher(**options) -> PageFetcher:
+    cache = TieredCache(path=os.path.join(tempfile.mkdtemp(), "pages.sqlite3"), namespace="pages")
+    return PageFetcher(PooledHTTPClient(max_retries=1), cache, **options)
+
+
+def test_per_host_cap():
+    fetcher = make_fetcher(per_host=2)
+    FixtureHandler.max_in_flight = 0
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        pages = fetcher.fetch_many([fixture_url(f"/page/{n}") for n in range(6)], executor)
+    assert all(page["status"] == "fetched" and page["title"] == "Fixture page" for page in pages), pages
+    assert FixtureHandler.max_in_flight == 2, FixtureHandler.max_in_flight
+
+
+def test_truncation():
+    fetcher = make_fetcher(max_bytes=100_000)
+    page = fetcher.fetch(fixture_url("/big"))
+    assert page["status"] == "fetched" and page["truncated"], page
+    assert fetcher.stats()["bytes_downloaded"] == 100_000, fetcher.stats()
+
+
+def test_content_type_rejected():
+    page = make_fetcher().fetch(fixture_url("/report.pdf"))
+    assert page["status"] == "error" and "application/pdf" in page["error"], page
+
+
+def test_deadline():
+    fetcher = make_fetcher(timeout=30)
+    executor = ThreadPoolExecutor(max_workers=2)
+    started = time.monotonic()
+    pages = fetcher.fetch_many([fixture_url("/slow"), fixture_url("/page/deadline")], executor, deadline=1)
+    returned = time.monotonic() - started
+    # The running fetch gives up at the deadline too, instead of holding its worker for the 30s timeout
+    executor.shutdown(wait=True)
+    finished = time.monotonic() - started
+    assert [page["status"] for page in pages] == ["error", "fetched"], pages
+    assert returned < 1.5 and finished < SLOW_SECONDS - 1, (returned, finished)
+    assert fetcher.stats()["errors"] == 1, fetcher.stats()
+
+
+def test_not_modified():
+    fetcher = make_fetcher(fresh_for=0)
+    first = fetcher.fetch(fixture_url("/etag"))
+    second = fetcher.fetch(fixture_url("/etag"))
+    assert first["status"] == "fetched" and first["etag"] == '"v1"', first
+    assert second["status"] == "not_modified" and second["text"] == first["text"], second
+
+
+if __name__ == "__main__":
+    print("🧪 Page fetch fixture test")
+    print("=" * 60)
+    failed = 0
+    for check in (test_per_host_cap, test_truncation, test_content_type_rejected, test_deadline, test_not_modified):
+        try:
+            check()
+            print(f"✅ {check.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {check.__name__}: {str(e)[:200]}")
+    exit(1 if failed else 0)
@@ -0,0 +1,226 @@
+"""Chunked vector index over past research: memory-mapped NumPy vectors, incremental appends, top-k retrieval"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+
+from prompt_budget import split_sections
+from semantic_cache import BUILTIN_ACRONYMS, STOP_WORDS, WORD_PATTERN, _stem
+
+VECTOR_FILE = "vectors.f32"
+CHUNK_DB = "chunks.sqlite3"
+BIGRAM_WEIGHT = 0.5
+# Candidates scored before per-document and kind filtering trims them to k
+CANDIDATE_FACTOR = 4
+
+
+@lru_cache(maxsize=1 << 18)
+def _slot(feature: str, dim: int):
+    """Hashed (column, sign) of a feature; the sign keeps colliding features from only ever adding up"""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+def features(text: str) -> Counter:
+    """Stemmed words (acronyms expanded, stop words dropped) and adjacent word pairs"""
+    words = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        expansion = BUILTIN_ACRONYMS.get(word)
+        words.extend(expansion.split() if expansion else [word])
+    words = [_stem(word) for word in words if word not in STOP_WORDS]
+    counts = Counter(words)
+    counts.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return counts
+
+
+class VectorIndex:
+    """Chunks of past research with hashed bag-of-words vectors, searchable by cosine similarity.
+
+    Row i of a memory-mapped float32 matrix (vectors.f32, L2-normalized rows) is chunk i in
+    chunks.sqlite3, which holds the text and where it came from. Appends write rows in place
+    and grow the file geometrically, so nothing is ever re-vectorized: reopening an index maps
+    the file. Vectors are flushed before their chunk rows commit, so a crash loses at most the
+    batch being written.
+    """
+
+    def __init__(self, directory: str, dim: int = 384, chunk_tokens: int = 256, initial_capacity: int = 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.chunk_tokens = chunk_tokens
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "search_seconds": 0.0}
+        self._db = sqlite3.connect(os.path.join(directory, CHUNK_DB), check_same_thread=False,
+                                   isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, doc_key TEXT NOT NULL, source TEXT NOT NULL, kind TEXT NOT NULL, "
+            "title TEXT NOT NULL, text TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks (doc_key)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # The stored dimension wins: vectors written with another one can't be compared
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else dim
+        self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+
+        self._path = os.path.join(directory, VECTOR_FILE)
+        self._count = self._db.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM chunks").fetchone()[0]
+        existing = os.path.getsize(self._path) // (self.dim * 4) if os.path.exists(self._path) else 0
+        self._map(max(existing, self._count, initial_capacity))
+        # Per-column document frequencies, for IDF weighting of queries
+        self._df = np.count_nonzero(self._vectors[:self._count], axis=0).astype(np.float64)
+
+    def _map(self, capacity: int):
+        if getattr(self, "_vectors", None) is not None:
+            self._vectors.flush()
+        with open(self._path, "ab") as f:
+            if f.tell() < capacity * self.dim * 4:
+                f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def vectorize(self, text: str) -> np.ndarray:
+        columns, values = [], []
+        for feature, count in features(text).items():
+            column, sign = _slot(feature, self.dim)
+            columns.append(column)
+            # Sublinear term frequency; word pairs count for less than single words
+            values.append(sign * (1.0 + math.log(count)) * (BIGRAM_WEIGHT if " " in feature else 1.0))
+        vector = np.bincount(columns, weights=values, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def add_documents(self, documents: List[Dict[str, Any]]) -> int:
+        """Chunk, embed and append documents ({source, kind, title, text}); returns the chunks added.
+
+        A document already indexed with the same source and text is skipped.
+        """
+        keyed = {}
+        for document in documents:
+            text = (document.get("text") or "").strip()
+            if text:
+                keyed[hashlib.sha1(f"{document.get('source') or ''}\n{text}".encode("utf-8")).hexdigest()] = document
+        with self._lock:
+            indexed = self._indexed(list(keyed))
+        # Embedding is the slow part, so it runs outside the lock
+        rows = []
+        for doc_key, document in keyed.items():
+            if doc_key in indexed:
+                continue
+            title = document.get("title") or ""
+            for chunk in split_sections(document["text"].strip(), self.chunk_tokens):
+                rows.append((doc_key, document.get("source") or "", document.get("kind") or "document", title, chunk,
+                             self.vectorize(f"{title}\n{chunk}")))
+
+        now = time.time()
+        with self._lock:
+            # Another thread may have indexed the same document meanwhile
+            indexed = self._indexed(list({row[0] for row in rows}))
+            rows = [row for row in rows if row[0] not in indexed]
+            if not rows:
+                return 0
+            start = self._count
+            if start + len(rows) > self._vectors.shape[0]:
+                capacity = self._vectors.shape[0]
+                while capacity < start + len(rows):
+                    capacity *= 2
+                self._map(capacity)
+            block = np.stack([row[-1] for row in rows])
+            self._vectors[start:start + len(rows)] = block
+            self._vectors.flush()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT INTO chunks (id, doc_key, source, kind, title, text, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(start + i,) + row[:-1] + (now,) for i, row in enumerate(rows)]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._df += np.count_nonzero(block, axis=0)
+            self._count += len(rows)
+        return len(rows)
+
+    def _indexed(self, doc_keys: List[str]) -> set:
+        """The doc_keys that already have chunks (call with the lock held)"""
+        indexed = set()
+        for i in range(0, len(doc_keys), 500):
+            batch = doc_keys[i:i + 500]
+            indexed.update(row[0] for row in self._db.execute(
+                f"SELECT DISTINCT doc_key FROM chunks WHERE doc_key IN ({','.join('?' * len(batch))})", batch
+            ))
+        return indexed
+
+    def search(self, query: str, k: int = 5, min_score: float = 0.0, kinds: List[str] = None,
+               per_document: int = 2) -> List[Dict[str, Any]]:
+        """Top k chunks by cosine similarity to query, at most per_document from any one document"""
+        start = time.perf_counter()
+        with self._lock:
+            # Appends only write past count and growing remaps, so this view stays valid unlocked
+            vectors, count, df = self._vectors, self._count, self._df.copy()
+        if count == 0 or k <= 0:
+            return []
+        # Words found in most chunks say little about which chunk is relevant
+        idf = (np.log((1.0 + count) / (1.0 + df)) + 1.0).astype(np.float32)
+        query_vector = self.vectorize(query) * idf
+        norm = np.linalg.norm(query_vector)
+        if norm == 0:
+            return []
+        scores = vectors[:count] @ (query_vector / norm)
+        candidates = min(count, k * CANDIDATE_FACTOR)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+        top = [int(row) for row in top if scores[row] >= min_score]
+
+        results: List[Dict[str, Any]] = []
+        if top:
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT id, doc_key, source, kind, title, text, created_at FROM chunks WHERE id IN ({','.join('?' * len(top))})",
+                    top
+                ).fetchall()
+            by_id = {row[0]: row for row in rows}
+            per_doc: Counter = Counter()
+            for chunk_id in top:
+                row = by_id.get(chunk_id)
+                if row is None or (kinds and row[3] not in kinds) or per_doc[row[1]] >= per_document:
+                    continue
+                per_doc[row[1]] += 1
+                results.append({"id": chunk_id, "source": row[2], "kind": row[3], "title": row[4], "text": row[5],
+                                "created_at": row[6], "score": round(float(scores[chunk_id]), 3)})
+                if len(results) >= k:
+                    break
+        with self._lock:
+            self._stats["searches"] += 1
+            self._stats["search_seconds"] += time.perf_counter() - start
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            count = self._count
+            documents = self._db.execute("SELECT COUNT(DISTINCT doc_key) FROM chunks").fetchone()[0]
+        return {
+            "chunks": count,
+            "documents": documents,
+            "dim": self.dim,
+            "vector_bytes": os.path.getsize(self._path),
+            "searches": stats["searches"],
+            "avg_search_ms": round(stats["search_seconds"] / stats["searches"] * 1000, 2) if stats["searches"] else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._vectors.flush()
+            self._db.close()
@@ -0,0 +1,87 @@
+"""Small dependency-graph executor used to run research workflow stages concurrently"""
+import time
+from concurrent.futures import Executor, Future, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class Stage:
+    """One workflow step: fn receives the results of finished stages and returns this stage's result"""
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any]], Any], deps: List[str] = None,
+                 background: bool = False, inline: bool = False):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps or [])
+        # Background stages are started once their deps finish but are not waited for
+        self.background = background
+        # Inline stages run on the calling thread (e.g. when fn drives UI callbacks)
+        self.inline = inline
+
+
+def run_stages(stages: List[Stage], executor: Executor) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, Future]]:
+    """Run stages as soon as their dependencies complete.
+
+    Returns (results, timings, background_futures). Timings are wall-clock seconds per
+    stage; background stages add their timing when they finish. A failing foreground
+    stage re-raises its exception once the stages already running have settled.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {', '.join(missing)}")
+
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    background: Dict[str, Future] = {}
+    pending = {stage.name for stage in stages}
+    running: Dict[Future, str] = {}
+
+    def timed(stage: Stage, inputs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return stage.fn(inputs)
+        finally:
+            timings[stage.name] = round(time.perf_counter() - start, 3)
+
+    while pending or running:
+        ready = [name for name in pending if all(dep in results for dep in by_name[name].deps)]
+        inline = []
+        for name in ready:
+            pending.discard(name)
+            stage = by_name[name]
+            if stage.inline and not stage.background:
+                inline.append(stage)
+                continue
+            future = executor.submit(timed, stage, dict(results))
+            if stage.background:
+                background[name] = future
+            else:
+                running[future] = name
+
+        # Pool stages keep running while inline stages execute here
+        if inline:
+            for stage in inline:
+                try:
+                    results[stage.name] = timed(stage, dict(results))
+                except Exception:
+                    wait(list(running))
+                    raise
+            continue
+
+        if not running:
+            if pending:
+                # Remaining stages wait on background stages, which are never awaited
+                raise ValueError(f"Unresolvable stage dependencies: {', '.join(sorted(pending))}")
+            break
+
+        done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            error = future.exception()
+            if error is not None:
+                wait(list(running))
+                raise error
+            results[name] = future.result()
+
+    return results, timings, background